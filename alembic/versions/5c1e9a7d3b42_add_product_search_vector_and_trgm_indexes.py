@@ -0,0 +1,52 @@
+"""add product search vector and trigram indexes
+
+Revision ID: 5c1e9a7d3b42
+Revises: 2207ee03fb32
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d3b42'
+down_revision: Union[str, Sequence[str], None] = '2207ee03fb32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PRODUCT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(one_liner, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Stored generated column: adding it rewrites the table, which backfills
+    # the vector for every existing product in the same step.
+    op.add_column(
+        'products',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(PRODUCT_SEARCH_VECTOR_SQL, persisted=True), nullable=True),
+    )
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_products_title_trgm', 'products', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_products_category_trgm', 'products', ['category'], unique=False, postgresql_using='gin', postgresql_ops={'category': 'gin_trgm_ops'})
+    op.create_index('ix_products_subcategory_trgm', 'products', ['subcategory'], unique=False, postgresql_using='gin', postgresql_ops={'subcategory': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_subcategory_trgm', table_name='products')
+    op.drop_index('ix_products_category_trgm', table_name='products')
+    op.drop_index('ix_products_title_trgm', table_name='products')
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,62 @@
+"""unique product analytics product_id
+
+Revision ID: a1c5e7f20b38
+Revises: f3b8c2d6a419
+Create Date: 2026-10-19 09:41:27.315092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c5e7f20b38'
+down_revision: Union[str, Sequence[str], None] = 'f3b8c2d6a419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent view-count flushes could insert a second row for a product.
+    # Fold duplicates into the oldest row: counters are summed, the rest is
+    # kept from that row.
+    op.execute(
+        """
+        WITH totals AS (
+            SELECT product_id,
+                   min(id) AS keep_id,
+                   sum(view_count) AS view_count,
+                   sum(purchase_count) AS purchase_count,
+                   sum(wishlist_count) AS wishlist_count,
+                   max(last_purchased_at) AS last_purchased_at
+            FROM product_analytics
+            GROUP BY product_id
+            HAVING count(*) > 1
+        )
+        UPDATE product_analytics pa
+        SET view_count = totals.view_count,
+            purchase_count = totals.purchase_count,
+            wishlist_count = totals.wishlist_count,
+            last_purchased_at = totals.last_purchased_at
+        FROM totals
+        WHERE pa.id = totals.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM product_analytics pa
+        USING product_analytics keep
+        WHERE pa.product_id = keep.product_id AND pa.id > keep.id
+        """
+    )
+    op.drop_index('ix_product_analytics_product_id', table_name='product_analytics')
+    op.create_index('ix_product_analytics_product_id', 'product_analytics', ['product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_analytics_product_id', table_name='product_analytics')
+    op.create_index('ix_product_analytics_product_id', 'product_analytics', ['product_id'], unique=False)
@@ -0,0 +1,34 @@
+"""add otp delivery status
+
+Revision ID: b3d7e1f09c24
+Revises: 8a4f2c6e1d90
+Create Date: 2026-10-18 12:41:05.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d7e1f09c24'
+down_revision: Union[str, Sequence[str], None] = '8a4f2c6e1d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('otps', sa.Column('delivery_status', sa.String(), server_default='queued', nullable=False))
+    op.add_column('otps', sa.Column('delivery_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('otps', sa.Column('delivery_error', sa.String(), nullable=True))
+    op.add_column('otps', sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('otps', 'delivered_at')
+    op.drop_column('otps', 'delivery_error')
+    op.drop_column('otps', 'delivery_attempts')
+    op.drop_column('otps', 'delivery_status')
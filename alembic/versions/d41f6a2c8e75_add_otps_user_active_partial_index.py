@@ -0,0 +1,34 @@
+"""add otps user active partial index
+
+Revision ID: d41f6a2c8e75
+Revises: b3d7e1f09c24
+Create Date: 2026-10-18 13:20:44.902317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a2c8e75'
+down_revision: Union[str, Sequence[str], None] = 'b3d7e1f09c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_otps_user_active',
+        'otps',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False,
+        postgresql_where=sa.text('is_used = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_otps_user_active', table_name='otps')
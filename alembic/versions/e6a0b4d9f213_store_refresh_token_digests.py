@@ -0,0 +1,45 @@
+"""store refresh token digests
+
+Revision ID: e6a0b4d9f213
+Revises: d41f6a2c8e75
+Create Date: 2026-10-18 14:05:31.447902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a0b4d9f213'
+down_revision: Union[str, Sequence[str], None] = 'd41f6a2c8e75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('jti', sa.String(length=32), nullable=True))
+
+    # Backfill: same digest as core.security.token_digest (SHA-256 of the UTF-8 JWT)
+    op.execute("UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8'))")
+
+    op.alter_column('refresh_tokens', 'token_hash', nullable=False)
+    op.create_unique_constraint('refresh_tokens_token_hash_key', 'refresh_tokens', ['token_hash'])
+
+    # Raw tokens no longer live in the database
+    op.drop_constraint('refresh_tokens_token_key', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'token')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Raw tokens cannot be recovered from digests: existing sessions must log in again
+    op.execute("DELETE FROM refresh_tokens")
+    op.add_column('refresh_tokens', sa.Column('token', sa.Text(), nullable=False))
+    op.create_unique_constraint('refresh_tokens_token_key', 'refresh_tokens', ['token'])
+    op.drop_constraint('refresh_tokens_token_hash_key', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'jti')
+    op.drop_column('refresh_tokens', 'token_hash')
@@ -0,0 +1,71 @@
+"""add keyset sort indexes
+
+Revision ID: e9d3a6b1f072
+Revises: c7e2d5a8f164
+Create Date: 2026-10-19 11:03:15.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9d3a6b1f072'
+down_revision: Union[str, Sequence[str], None] = 'c7e2d5a8f164'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ANALYTICS_COUNTERS = ('view_count', 'purchase_count', 'rating', 'review_count', 'stock_count', 'wishlist_count')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pages are range scans on (sort key, id); each sort needs its index
+    op.create_index('ix_products_price_id', 'products', ['price', 'id'], unique=False)
+    op.create_index('ix_products_discounted_price_id', 'products', [sa.text('coalesce(discounted_price, price)'), 'id'], unique=False)
+    op.create_index('ix_products_created_at_id', 'products', ['created_at', 'id'], unique=False)
+    op.create_index('ix_products_title_id', 'products', ['title', 'id'], unique=False)
+
+    # Analytics sorts inner-join product_analytics and walk its indexes, so
+    # every product gets a row and the counters lose their NULLs
+    op.execute(
+        """
+        UPDATE product_analytics
+        SET rating = coalesce(rating, 0),
+            review_count = coalesce(review_count, 0),
+            stock_count = coalesce(stock_count, 0),
+            wishlist_count = coalesce(wishlist_count, 0)
+        WHERE rating IS NULL OR review_count IS NULL OR stock_count IS NULL OR wishlist_count IS NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO product_analytics (
+            product_id, view_count, purchase_count, rating,
+            review_count, stock_count, wishlist_count
+        )
+        SELECT p.id, 0, 0, 0.0, 0, 0, 0
+        FROM products p
+        ON CONFLICT (product_id) DO NOTHING
+        """
+    )
+    for column in ANALYTICS_COUNTERS:
+        op.alter_column('product_analytics', column, nullable=False, server_default=sa.text('0'))
+        op.create_index(f'ix_product_analytics_{column}_product_id', 'product_analytics', [column, 'product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(ANALYTICS_COUNTERS):
+        op.drop_index(f'ix_product_analytics_{column}_product_id', table_name='product_analytics')
+        op.alter_column(
+            'product_analytics', column,
+            nullable=column not in ('view_count', 'purchase_count'),
+            server_default=None,
+        )
+    op.drop_index('ix_products_title_id', table_name='products')
+    op.drop_index('ix_products_created_at_id', table_name='products')
+    op.drop_index('ix_products_discounted_price_id', table_name='products')
+    op.drop_index('ix_products_price_id', table_name='products')
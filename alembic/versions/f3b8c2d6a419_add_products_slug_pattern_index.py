@@ -0,0 +1,30 @@
+"""add products slug pattern index
+
+Revision ID: f3b8c2d6a419
+Revises: e6a0b4d9f213
+Create Date: 2026-10-18 18:05:12.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8c2d6a419'
+down_revision: Union[str, Sequence[str], None] = 'e6a0b4d9f213'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # text_pattern_ops lets slug LIKE 'base-%' use an index range scan
+    # regardless of the database collation
+    op.create_index('ix_products_slug_pattern', 'products', ['slug'], unique=False, postgresql_ops={'slug': 'text_pattern_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_slug_pattern', table_name='products')
@@ -1,24 +1,24 @@
 from fastapi import APIRouter, Depends, Response, Request
-from sqlalchemy.orm import Session
-from db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_async_db
+from core.auth import get_current_user
 from services.auth_service import request_otp, verify_otp_and_issue_tokens, refresh_tokens
-from schemas.auth import RequestOTP, OTPVerifyRequest, AuthResponse
+from schemas.auth import RequestOTP, OTPVerifyRequest, AuthResponse, CurrentUser
 
 router = APIRouter(prefix="/v1/auth", tags=["Auth"])
 
 # 1️⃣ Request OTP
 @router.post("/request-otp")
-def request_otp_route(payload: RequestOTP, db: Session = Depends(get_db)):
-    return request_otp(db, payload.identifier)
+async def request_otp_route(payload: RequestOTP, db: AsyncSession = Depends(get_async_db)):
+    return await request_otp(db, payload.identifier)
 
 
 # 2️⃣ Verify OTP & login (issue tokens)
 @router.post("/verify-otp", response_model=AuthResponse)
-def verify_otp_route(payload: OTPVerifyRequest, response: Response, db: Session = Depends(get_db)):
-    access_token, refresh_token, user = verify_otp_and_issue_tokens(db, payload.identifier, payload.otp)
+async def verify_otp_route(payload: OTPVerifyRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
+    access_token, refresh_token, user = await verify_otp_and_issue_tokens(db, payload.identifier, payload.otp)
 
     # Set refresh token in HttpOnly cookie
-    print("Setting refresh token cookie", refresh_token)
     response.set_cookie(
         key="refresh_token",
         value=refresh_token,
@@ -41,8 +41,8 @@ def verify_otp_route(payload: OTPVerifyRequest, response: Response, db: Session
 
 # 3️⃣ Refresh tokens
 @router.post("/refresh", response_model=AuthResponse)
-def refresh_token_route(request: Request, response: Response, db: Session = Depends(get_db)):
-    access_token, refresh_token, user = refresh_tokens(request, db)
+async def refresh_token_route(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    access_token, refresh_token, user = await refresh_tokens(request, db)
 
     response.set_cookie(
         key="refresh_token",
@@ -62,3 +62,9 @@ def refresh_token_route(request: Request, response: Response, db: Session = Depe
             "phone_number": user.phone_number,
         },
     }
+
+
+# 4️⃣ Current user
+@router.get("/me", response_model=CurrentUser)
+async def me_route(user: CurrentUser = Depends(get_current_user)):
+    return user
@@ -1,13 +1,25 @@
 from fastapi import APIRouter, Depends, Response, Request, HTTPException, status, Body, Query
-from sqlalchemy.orm import Session
-from db.session import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_async_db
 from services.auth_service import request_otp, verify_otp_and_issue_tokens, refresh_tokens
-from schemas.products import ProductCreate, ProductResponse, PaginatedProducts
-from typing import List, Optional
+from schemas.products import ProductCreate, ProductResponse, PaginatedProducts, CursorPaginatedProducts, ShowcaseResponse, ProductImportReport, ProductUpdate
+from typing import List, Optional, Union
+from datetime import datetime
+import csv
 from fastapi import Form
 from fastapi import UploadFile, File
-from services.product_service import create_product, get_products_paginated, get_product_by_id
+from services.product_service import create_product, update_product, get_products_paginated, get_products_keyset, get_product_by_id, ProductUpdateResult
 from services.s3_service import s3_service
+from services.product_import import ProductImporter, detect_format
+from services.product_export import EXPORT_FORMATS, stream_export
+from services.view_counter import view_counter
+from services.showcase_service import showcase
+from core.cache import response_cache
+from core.config import settings
+from core.auth import get_current_user
+from schemas.auth import CurrentUser
+from core.http_cache import conditional_json_response, not_modified_response
 
 
 
@@ -16,7 +28,6 @@ router = APIRouter(prefix="/v1/products", tags=["Products"])
 
 from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException
 from typing import List
-from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/v1/products", tags=["Products"])
 
@@ -32,17 +43,11 @@ async def add_product(
     dimensions: Optional[str] = Form(None),
     slug: Optional[str] = Form(None),
     images: List[UploadFile] = File([]),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Upload images to S3
-    image_links = []
-    for image in images:
-        try:
-            await image.seek(0)
-            url = await s3_service.upload_image(image)  # pass UploadFile directly
-            image_links.append(url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to upload {image.filename}: {str(e)}")
+    # Upload images to S3 (processed concurrently, off the event loop)
+    image_manifests = await s3_service.upload_images(images)
+    image_links = [manifest["original"] for manifest in image_manifests]
 
     # Build product data
     product_data = ProductCreate(
@@ -58,18 +63,139 @@ async def add_product(
     )
 
     # Create product in DB
-    product = create_product(db, product_data=product_data, image_links=image_links)
+    try:
+        product = await create_product(
+            db, product_data=product_data, image_links=image_links, image_variants=image_manifests
+        )
+    except Exception:
+        # Originals have unique keys; shared variants are left to the image GC
+        await s3_service.delete_images(image_links)
+        raise
     if not product:
         raise HTTPException(status_code=400, detail="Product creation failed")
 
+    await response_cache.invalidate_product(product.id)
+    showcase.mark_dirty(product.category)
     return product
 
 
+async def _after_update(result: ProductUpdateResult):
+    """Invalidate caches and delete dropped images once an update is committed."""
+    if result.changed:
+        await response_cache.invalidate_product(result.product.id)
+        showcase.mark_dirty(result.previous_category)
+        showcase.mark_dirty(result.product.category)
+    if result.unreferenced_images:
+        await s3_service.delete_images(result.unreferenced_images)
 
 
-@router.get("/", response_model=PaginatedProducts)
-def list_products(
-    db: Session = Depends(get_db),
+@router.patch("/{product_id}", response_model=ProductResponse)
+async def patch_product(
+    product_id: int,
+    changes: ProductUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Change some fields of a product. Only the fields sent are touched;
+    image_links may drop or reorder existing images (dropped ones are
+    deleted from storage). Nothing is uploaded; use PUT to add images.
+    """
+    result = await update_product(db, product_id, changes.model_dump(exclude_unset=True))
+    await _after_update(result)
+    return result.product
+
+
+@router.put("/{product_id}", response_model=ProductResponse)
+async def replace_product(
+    product_id: int,
+    title: str = Form(...),
+    one_liner: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    price: float = Form(...),
+    discounted_price: Optional[float] = Form(None),
+    category: Optional[str] = Form(None),
+    subcategory: Optional[str] = Form(None),
+    dimensions: Optional[str] = Form(None),
+    slug: Optional[str] = Form(None),
+    is_active: bool = Form(True),
+    image_links: Optional[List[str]] = Form(
+        None,
+        description="Existing images to keep, in order; the rest are deleted. Omit to keep them all, "
+                    "send one empty value to delete them all",
+    ),
+    images: List[UploadFile] = File([], description="New images, added after the kept ones"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Replace a product's fields. Kept images are not re-uploaded; only the
+    files in `images` are. The slug is kept unless one is given, and the
+    current images are kept unless `image_links` is sent.
+    """
+    image_manifests = await s3_service.upload_images(images)
+
+    changes = {
+        "title": title,
+        "one_liner": one_liner,
+        "description": description,
+        "price": price,
+        "discounted_price": discounted_price,
+        "category": category,
+        "subcategory": subcategory,
+        "dimensions": dimensions,
+        "is_active": is_active,
+    }
+    if slug:
+        changes["slug"] = slug
+    if image_links is not None:
+        # A form cannot send an empty list; an empty value stands for one
+        changes["image_links"] = [url for url in image_links if url]
+
+    try:
+        result = await update_product(db, product_id, changes, new_images=image_manifests)
+    except Exception:
+        # Originals have unique keys; shared variants are left to the image GC
+        await s3_service.delete_images([manifest["original"] for manifest in image_manifests])
+        raise
+    await _after_update(result)
+    return result.product
+
+
+@router.post("/import", response_model=ProductImportReport)
+async def import_products(
+    file: UploadFile = File(..., description="CSV or JSONL; see services.product_import for the columns"),
+    format: Optional[str] = Query(None, regex="^(csv|jsonl)$", description="Defaults from the file extension"),
+    fetch_images: bool = Query(True, description="Fetch image_urls (IMAGE_FETCH_ALLOWED_HOSTS only) into storage; false stores them as given"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Bulk import products. Rows are processed in chunks as the file is read;
+    rows that fail are listed in the report and do not stop the import.
+    Only users in PRODUCT_IMPORT_ALLOWED_USERS may import.
+    For very large catalogs prefer `python -m services.product_import`.
+    """
+    allowed = set(settings.PRODUCT_IMPORT_ALLOWED_USERS)
+    if user.id not in allowed and (user.email is None or user.email not in allowed):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to import products")
+
+    fmt = format or detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Cannot tell the file format; pass format=csv or format=jsonl")
+
+    importer = ProductImporter(fetch_images=fetch_images)
+    try:
+        return await importer.run(file.file, fmt)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail=f"File is not valid UTF-8 (after {importer.report.rows} rows)")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV (after {importer.report.rows} rows): {str(e)}")
+
+
+
+
+@router.get("/", response_model=Union[PaginatedProducts, CursorPaginatedProducts])
+async def list_products(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = None,
@@ -78,33 +204,128 @@ def list_products(
     is_active: Optional[bool] = True,
     sort_by: Optional[str] = Query(None, description="Field to sort by: price, created_at, title, discounted_price"),
     sort_order: str = Query("asc", regex="^(asc|desc)$", description="Sort order: asc or desc"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$", description="Pagination mode: offset or cursor"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor/prev_cursor (implies cursor mode)"),
+    include_total: bool = Query(False, description="Cursor mode only: also count matching products"),
 ):
-    products, total = get_products_paginated(
-        db=db,
-        page=page,
-        limit=limit,
-        category=category,
-        subcategory=subcategory,
-        search=search,
-        is_active=is_active,
-        sort_by=sort_by,
-        sort_order=sort_order,
-    )
-
-    return {
-        "page": page,
+    cursor_mode = pagination == "cursor" or bool(cursor)
+    params = {
+        "mode": "cursor" if cursor_mode else "offset",
+        "page": None if cursor_mode else page,
         "limit": limit,
-        "total": total,
-        "pages": (total + limit - 1) // limit,
-        "data": products,
+        "category": category,
+        "subcategory": subcategory,
+        "search": search.strip() if search else None,
+        "is_active": is_active,
+        "sort_by": sort_by,
+        "sort_order": sort_order.lower(),
+        "cursor": cursor,
+        "include_total": include_total if cursor_mode else None,
     }
 
+    async def load() -> bytes:
+        if cursor_mode:
+            products, next_cursor, prev_cursor, total = await get_products_keyset(
+                db=db,
+                limit=limit,
+                cursor=cursor,
+                category=category,
+                subcategory=subcategory,
+                search=search,
+                is_active=is_active,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                include_total=include_total,
+            )
+            return CursorPaginatedProducts.model_validate({
+                "limit": limit,
+                "total": total,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "data": products,
+            }).model_dump_json().encode()
+
+        products, total = await get_products_paginated(
+            db=db,
+            page=page,
+            limit=limit,
+            category=category,
+            subcategory=subcategory,
+            search=search,
+            is_active=is_active,
+            sort_by=sort_by,
+            sort_order=sort_order,
+        )
+
+        return PaginatedProducts.model_validate({
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "pages": (total + limit - 1) // limit,
+            "data": products,
+        }).model_dump_json().encode()
+
+    key = await response_cache.listing_key(params)
+    etag = response_cache.etag_for(key)
+    not_modified = not_modified_response(request, etag, settings.PRODUCT_LISTING_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    content = await response_cache.get_or_load(key, load)
+    return conditional_json_response(request, content, settings.PRODUCT_LISTING_CACHE_CONTROL, etag)
+
+
+@router.get("/showcase", response_model=ShowcaseResponse)
+async def get_showcase(
+    request: Request,
+    per_category: Optional[int] = Query(None, ge=1, description="Products per category (capped by server config)"),
+):
+    """
+    Top products for every category, for the homepage.
+    Served from a periodically refreshed in-memory index; no database access.
+    """
+    content = await showcase.get_response(per_category)
+    return conditional_json_response(request, content, settings.PRODUCT_LISTING_CACHE_CONTROL)
+
+
+@router.get("/export")
+async def export_products(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    is_active: Optional[bool] = True,
+):
+    """
+    Stream the whole catalog (products with analytics) for feeds, from a
+    server-side cursor. Unlike listings there is no page size, COUNT or
+    OFFSET, and memory does not grow with the catalog.
+    """
+    filename = f"products-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        stream_export(format, category=category, subcategory=subcategory, is_active=is_active),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     API endpoint to get a product by ID.
-    Logic is delegated to helper function.
+    Served from the response cache; on a miss logic is delegated to helper function.
+    Honors If-None-Match with a 304 and no body, before the product is loaded.
     """
-    product = get_product_by_id(db, product_id)
-    return product
\ No newline at end of file
+    async def load() -> bytes:
+        product = await get_product_by_id(db, product_id)
+        return ProductResponse.model_validate(product).model_dump_json().encode()
+
+    key = await response_cache.product_key(product_id)
+    etag = response_cache.etag_for(key)
+    not_modified = not_modified_response(request, etag, settings.PRODUCT_DETAIL_CACHE_CONTROL)
+    if not_modified is not None:
+        view_counter.record(product_id)
+        return not_modified
+
+    content = await response_cache.get_or_load(key, load)
+    view_counter.record(product_id)
+    return conditional_json_response(request, content, settings.PRODUCT_DETAIL_CACHE_CONTROL, etag)
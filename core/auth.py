@@ -0,0 +1,147 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from core.config import settings
+from core.metrics import metrics
+from core.security import token_digest, verify_access_token_signature
+from db.session import db
+from models.users import User
+from schemas.auth import CurrentUser
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+class ClaimsCache:
+    """
+    Bounded LRU of verified access-token claims, keyed by token digest.
+    A hit skips signature verification; entries are only served until the
+    token's own exp, so caching never extends a token's lifetime.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def put(self, digest: bytes, claims: dict):
+        exp = claims.get("exp")
+        if exp is None:
+            return
+        self._entries[digest] = (claims, float(exp))
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class UserSnapshotCache:
+    """
+    Short-TTL cache of CurrentUser snapshots by user id, so most
+    authenticated requests need no User query. A change to a user (e.g.
+    deactivation) is seen within ttl seconds, or at once after invalidate().
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[CurrentUser, float]]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[CurrentUser]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        return user
+
+    def put(self, user: CurrentUser):
+        self._entries[user.id] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+
+claims_cache = ClaimsCache(max_entries=settings.AUTH_CLAIMS_CACHE_SIZE)
+user_cache = UserSnapshotCache(ttl=settings.AUTH_USER_CACHE_TTL_SECONDS, max_entries=settings.AUTH_USER_CACHE_SIZE)
+
+
+def verify_access_token(token: str) -> dict:
+    """Claims of a valid access token, from the cache when possible."""
+    digest = token_digest(token)
+    claims = claims_cache.get(digest)
+    if claims is not None:
+        metrics.inc("auth.claims_cache.hits")
+        return claims
+
+    metrics.inc("auth.claims_cache.misses")
+    claims = verify_access_token_signature(token)
+    claims_cache.put(digest, claims)
+    return claims
+
+
+async def load_user_snapshot(user_id: str) -> Optional[CurrentUser]:
+    user = user_cache.get(user_id)
+    if user is not None:
+        metrics.inc("auth.user_cache.hits")
+        return user
+
+    metrics.inc("auth.user_cache.misses")
+    async with db.get_async_session() as session:
+        row = await session.get(User, user_id)
+        if row is None:
+            return None
+        user = CurrentUser(
+            id=row.id,
+            email=row.email,
+            phone_number=row.phone_number,
+            is_verified=bool(row.is_verified),
+            is_active=row.is_active is not False,
+        )
+    user_cache.put(user)
+    return user
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> CurrentUser:
+    """
+    FastAPI dependency for authenticated routes: resolves the bearer access
+    token to the current user. Usually answered from memory without a
+    signature check or a database query.
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    claims = verify_access_token(credentials.credentials)
+    user_id = claims.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    user = await load_user_snapshot(user_id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    return user
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Byte-oriented key/value store used by ResponseCache."""
+
+    # Whether the counters track catalog writes, and which processes share them
+    versioned = True
+    scope = ""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Caching disabled: every lookup is a miss."""
+
+    versioned = False
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        pass
+
+    async def delete(self, key: str):
+        pass
+
+    async def get_counter(self, key: str) -> int:
+        return 0
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # Each worker counts its own writes, so versions are only comparable within it
+        self.scope = uuid.uuid4().hex
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Counters live outside the LRU so a version key is never evicted
+        self._counters: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisCache(CacheBackend):
+    """Redis (or any Redis-protocol server) backend; shared across workers."""
+
+    def __init__(self, url: str, prefix: str = "xsnapster:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+
+class ResponseCache:
+    """
+    Read-through cache of pre-serialized JSON responses.
+
+    Concurrent misses on the same key share a single load (single-flight),
+    so a cold or just-invalidated hot key costs one database query per
+    worker. Keys embed a catalog version counter that is bumped on every
+    product write: this invalidates all cached entries at once, and a load
+    that raced with a write can only populate a key nobody reads any more.
+    """
+
+    CATALOG_VERSION_KEY = "products:version"
+
+    def __init__(self, backend: CacheBackend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def _record(self, hit: bool, started: float):
+        if hit:
+            self._hits += 1
+            metrics.inc("cache.hits")
+        else:
+            self._misses += 1
+            metrics.inc("cache.misses")
+        metrics.set_gauge("cache.hit_ratio", self._hits / (self._hits + self._misses))
+        metrics.observe("cache.lookup_seconds", time.monotonic() - started)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return the cached bytes for key, calling loader once on a miss."""
+        started = time.monotonic()
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {str(e)}")
+            cached = None
+
+        if cached is not None:
+            self._record(True, started)
+            return cached
+        self._record(False, started)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leading request was cancelled; load it ourselves
+                return await loader()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            load_started = time.monotonic()
+            value = await loader()
+            metrics.observe("cache.load_seconds", time.monotonic() - load_started)
+            future.set_result(value)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark retrieved so the loop does not warn
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {str(e)}")
+        return value
+
+    async def catalog_version(self) -> int:
+        try:
+            return await self.backend.get_counter(self.CATALOG_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Cache version lookup failed: {str(e)}")
+            return -1
+
+    async def product_key(self, product_id: int) -> str:
+        version = await self.catalog_version()
+        return f"products:v{version}:detail:{product_id}"
+
+    async def listing_key(self, params: dict) -> str:
+        """Key for a listing request: catalog version + normalized params."""
+        version = await self.catalog_version()
+        normalized = json.dumps(
+            {k: v for k, v in sorted(params.items()) if v is not None},
+            separators=(",", ":"),
+            default=str,
+        )
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"products:v{version}:list:{digest}"
+
+    def etag_for(self, key: str) -> Optional[str]:
+        """
+        ETag for the response cached under key, known before it is loaded, so
+        If-None-Match can be answered without touching the database. The key
+        carries the catalog version and the request; the TTL period is mixed
+        in so counters the version does not track (views) refresh at the
+        cache's own pace. None when the version is unknown: callers then fall
+        back to hashing the body.
+        """
+        if not self.backend.versioned or ":v-1:" in key:
+            return None
+        period = int(time.time() // self.ttl) if self.ttl > 0 else 0
+        validator = f"{self.backend.scope}:{key}:{period}"
+        return '"' + hashlib.sha256(validator.encode("utf-8")).hexdigest()[:32] + '"'
+
+    async def invalidate_product(self, product_id: int):
+        """Invalidate cached responses after product_id was created or changed."""
+        try:
+            await self.backend.incr(self.CATALOG_VERSION_KEY)
+        except Exception as e:
+            logger.error(f"Cache invalidation failed for product {product_id}: {str(e)}")
+
+    async def invalidate_catalog(self):
+        """Invalidate every cached response, e.g. after a bulk write."""
+        try:
+            await self.backend.incr(self.CATALOG_VERSION_KEY)
+        except Exception as e:
+            logger.error(f"Cache invalidation failed: {str(e)}")
+
+
+def _build_backend() -> CacheBackend:
+    backend = settings.CACHE_BACKEND.lower()
+    if backend == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL)
+    if backend == "memory":
+        return MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES)
+    return NullCache()
+
+
+response_cache = ResponseCache(_build_backend(), ttl=settings.CACHE_TTL_SECONDS)
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +28,134 @@ class Settings(BaseSettings):
     AWS_REGION: str
     SUPABASE_STORAGE_URL: str
 
+    # Product view counting
+    VIEW_COUNT_FLUSH_INTERVAL_SECONDS: float = 5.0
+    VIEW_COUNT_MAX_PENDING_PRODUCTS: int = 1000
+
+    # Database connection pools (applied to both the sync and async engines)
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL (asyncpg) if unset
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # replace connections older than this (-1 never)
+    DB_POOL_USE_LIFO: bool = True  # reuse warm connections; lets idle overflow age out
+    DB_WARN_QUERIES_PER_REQUEST: int = 0  # dev: log requests issuing more queries (0 disables)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables the server-side timeout
+
+    # Product image processing
+    IMAGE_PROCESS_WORKERS: int = 2  # processes for decode/resize/encode
+    IMAGE_UPLOAD_THREADS: int = 8  # threads for blocking S3 calls
+    IMAGE_UPLOAD_CONCURRENCY: int = 4  # images processed at once per request
+    IMAGE_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    IMAGE_UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # intake read size
+    IMAGE_MAX_PIXELS: int = 36_000_000  # decoded size cap (after JPEG draft scaling); ~144MB as RGBA
+    IMAGE_FETCH_TIMEOUT_SECONDS: float = 20.0  # per image URL fetched by bulk imports
+    IMAGE_FETCH_ALLOWED_HOSTS: List[str] = []  # hosts bulk imports may fetch images from; empty disables fetching
+    S3_MULTIPART_THRESHOLD_BYTES: int = 8 * 1024 * 1024
+    S3_MULTIPART_CHUNK_BYTES: int = 8 * 1024 * 1024
+    S3_MULTIPART_CONCURRENCY: int = 2  # parts in flight per file
+    S3_DELETE_BATCH_SIZE: int = 1000  # keys per delete_objects call (S3 maximum)
+
+    # Responsive image variants: every size is rendered in every format
+    # (formats the installed Pillow cannot encode are skipped)
+    IMAGE_VARIANT_SIZES: Dict[str, Tuple[int, int]] = {
+        "thumb": (320, 320),
+        "card": (640, 640),
+        "detail": (1280, 1280),
+    }
+    IMAGE_VARIANT_FORMATS: List[str] = ["webp", "avif"]
+    IMAGE_VARIANT_QUALITY: int = 80
+
+    # Response cache for product detail/listing
+    CACHE_BACKEND: str = "memory"  # memory, redis or none
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"  # needs the optional 'redis' package
+    CACHE_TTL_SECONDS: int = 60
+    CACHE_MAX_ENTRIES: int = 10000  # memory backend only
+
+    # HTTP caching headers for product responses (empty string disables)
+    PRODUCT_DETAIL_CACHE_CONTROL: str = "public, max-age=60"
+    PRODUCT_LISTING_CACHE_CONTROL: str = "public, max-age=30, stale-while-revalidate=60"
+
+    # Bulk product import (POST /v1/products/import, python -m services.product_import)
+    PRODUCT_IMPORT_CHUNK_SIZE: int = 500  # rows per INSERT and commit (at most 2000)
+    PRODUCT_IMPORT_IMAGE_CONCURRENCY: int = 8  # image URLs fetched and processed at once
+    PRODUCT_IMPORT_MAX_REPORTED_ERRORS: int = 1000  # row errors kept in the returned report
+    PRODUCT_IMPORT_ALLOWED_USERS: List[str] = []  # user ids or emails allowed to POST /import; empty: CLI only
+
+    # Catalog export (GET /v1/products/export, python -m services.product_export)
+    PRODUCT_EXPORT_BATCH_SIZE: int = 1000  # rows fetched from the server-side cursor at a time
+    PRODUCT_EXPORT_CHUNK_BYTES: int = 64 * 1024  # response chunk size
+
+    # Orphaned image GC (python -m services.image_gc)
+    IMAGE_GC_PREFIX: str = "inventory/"
+    IMAGE_GC_GRACE_SECONDS: int = 24 * 3600  # younger objects may belong to an upload in flight
+    IMAGE_GC_MAX_DELETE_FRACTION: float = 0.5  # refuse runs that would delete more of the prefix
+
+    # Homepage showcase: top products per category, kept in memory
+    SHOWCASE_PRODUCTS_PER_CATEGORY: int = 4
+    SHOWCASE_REFRESH_SECONDS: float = 30.0  # re-rank categories touched by writes
+    SHOWCASE_FULL_REFRESH_SECONDS: float = 300.0  # re-rank everything (analytics drift)
+
+    # Asymmetric access-token signing (ES256/EdDSA); manage keys with `python -m core.keyring`
+    JWT_KEYRING_PATH: Optional[str] = None  # unset: access tokens are signed with SECRET_KEY
+    JWT_KEYRING_RELOAD_SECONDS: float = 30.0  # how often workers check the key file for rotations
+    JWT_ACCEPT_LEGACY_HS_TOKENS: bool = True  # accept SECRET_KEY tokens without kid (migration window)
+    JWKS_CACHE_CONTROL: str = "public, max-age=300"
+
+    # Rate limits, enforced by middleware before routing: "METHOD /path" ->
+    # ["ip:<limit>/<window seconds>", "identifier:<limit>/<window seconds>"]
+    RATE_LIMIT_BACKEND: str = "memory"  # memory (per process), redis or none
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # defaults to CACHE_REDIS_URL
+    RATE_LIMIT_MAX_KEYS: int = 100000  # memory backend only
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # enable only behind a proxy that sets it
+    RATE_LIMITS: Dict[str, List[str]] = {
+        "POST /v1/auth/request-otp": ["ip:20/60", "identifier:5/600"],
+        "POST /v1/auth/verify-otp": ["ip:30/60", "identifier:5/300"],
+        "POST /v1/auth/refresh": ["ip:60/60"],
+    }
+
+    # Access-token verification caches (get_current_user)
+    AUTH_CLAIMS_CACHE_SIZE: int = 10000  # verified tokens kept; served until their exp
+    AUTH_USER_CACHE_TTL_SECONDS: float = 30.0  # how stale a user snapshot may be
+    AUTH_USER_CACHE_SIZE: int = 10000
+
+    # OTP storage: sql (otps table), memory (single process only) or redis
+    OTP_STORE_BACKEND: str = "sql"
+    OTP_STORE_REDIS_URL: Optional[str] = None  # defaults to CACHE_REDIS_URL
+    OTP_TTL_SECONDS: int = 300
+
+    # Janitor: reclaims expired OTPs and expired/revoked refresh tokens
+    JANITOR_ENABLED: bool = True
+    JANITOR_INTERVAL_SECONDS: float = 600.0
+    JANITOR_BATCH_SIZE: int = 1000  # rows per transaction
+    JANITOR_BATCH_PAUSE_SECONDS: float = 0.1
+    JANITOR_MAX_BATCHES_PER_RUN: int = 100  # per table; the rest waits for the next run
+    JANITOR_LOCK_TIMEOUT_MS: int = 2000
+    JANITOR_OTP_GRACE_SECONDS: int = 3600  # keep expired OTPs this long (delivery debugging)
+    JANITOR_REFRESH_TOKEN_GRACE_SECONDS: int = 86400
+    JANITOR_ARCHIVE: bool = False  # move rows to monthly *_archive partitions instead of deleting
+
+    # OTP delivery worker and SMTP connection pool
+    OTP_DELIVERY_WORKERS: int = 4
+    OTP_DELIVERY_QUEUE_SIZE: int = 10000
+    OTP_DELIVERY_MAX_ATTEMPTS: int = 4
+    OTP_DELIVERY_RETRY_BASE_SECONDS: float = 1.0  # doubled after every failed attempt
+    SMTP_POOL_SIZE: int = 4
+    SMTP_CONNECTION_MAX_IDLE_SECONDS: float = 60.0
+    SMTP_TIMEOUT_SECONDS: float = 10.0
+    OTP_DELIVERY_BATCH_SIZE: int = 50  # queued jobs a worker takes at once
+
+    # OTP channels: providers are smtp/fake for email and sns/fake for SMS
+    OTP_EMAIL_PROVIDER: str = "smtp"
+    OTP_EMAIL_CONCURRENCY: int = 4  # batches in flight; capped by SMTP_POOL_SIZE
+    OTP_EMAIL_RATE_PER_SECOND: float = 50.0  # 0 disables the limit
+    OTP_EMAIL_BATCH_SIZE: int = 20  # emails sent per pooled connection checkout
+    OTP_SMS_PROVIDER: str = "sns"
+    OTP_SMS_CONCURRENCY: int = 16
+    OTP_SMS_RATE_PER_SECOND: float = 20.0  # keep at or below the SNS SMS TPS quota
+    OTP_SMS_SNS_REGION: Optional[str] = None  # defaults to AWS_REGION
+    OTP_SMS_SENDER_ID: Optional[str] = None
 
 
     class Config:
@@ -0,0 +1,51 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+
+def compute_etag(content: bytes) -> str:
+    """Strong ETag derived from the exact response body."""
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header matches etag (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _validator_headers(etag: str, cache_control: str) -> dict:
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def not_modified_response(request: Request, etag: Optional[str], cache_control: str) -> Optional[Response]:
+    """
+    304 Not Modified if the client already holds etag, else None. For ETags
+    known before the body is loaded (ResponseCache.etag_for).
+    """
+    if etag is None or not etag_matches(request, etag):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_validator_headers(etag, cache_control))
+
+
+def conditional_json_response(request: Request, content: bytes, cache_control: str, etag: Optional[str] = None) -> Response:
+    """
+    Serve pre-serialized JSON with ETag and Cache-Control validators,
+    answering 304 Not Modified when the client already has this body.
+    Without an etag, it is a hash of the body.
+    """
+    etag = etag or compute_etag(content)
+    headers = _validator_headers(etag, cache_control)
+
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -0,0 +1,248 @@
+"""
+JWT signing key ring.
+
+Keys live in a JSON file (JWT_KEYRING_PATH) that only this API can read:
+
+    {"keys": [{"kid": ..., "alg": "ES256" | "EdDSA", "status": ...,
+               "created_at": ..., "retired_at": ..., "private_key": PEM}]}
+
+status is one of:
+    pending   published in the JWKS, not yet signing
+    active    signs new tokens (exactly one)
+    retiring  no longer signs; still verifies until its tokens have expired
+
+Rotation is done offline with this module's CLI, then picked up by running
+workers within JWT_KEYRING_RELOAD_SECONDS:
+
+    python -m core.keyring add --alg ES256     # new pending key
+    python -m core.keyring activate <kid>      # once JWKS caches have it
+    python -m core.keyring prune --older-than 3600
+    python -m core.keyring list
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ALGORITHMS = ("ES256", "EdDSA")
+
+
+@dataclass
+class SigningKey:
+    kid: str
+    alg: str
+    status: str
+    private_key: object
+
+    @property
+    def public_key(self):
+        return self.private_key.public_key()
+
+    def public_jwk(self) -> dict:
+        if self.alg == "ES256":
+            jwk = ECAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        return {**jwk, "kid": self.kid, "alg": self.alg, "use": "sig"}
+
+
+def generate_private_key(alg: str):
+    if alg == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if alg == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported algorithm '{alg}', expected one of {', '.join(SUPPORTED_ALGORITHMS)}")
+
+
+def load_document(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"keys": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_document(path: str, document: dict):
+    """Write the key file atomically, readable by the owner only."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".keyring-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class KeyRing:
+    """
+    Signing and verification keys loaded from the key file. The file is
+    re-read when its mtime changes, checked at most every reload_interval
+    seconds, so rotations reach running workers without a restart.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 30.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._keys: Dict[str, SigningKey] = {}
+        self._active: Optional[SigningKey] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        keys: Dict[str, SigningKey] = {}
+        active = None
+        for entry in load_document(self.path)["keys"]:
+            private_key = serialization.load_pem_private_key(entry["private_key"].encode("utf-8"), password=None)
+            key = SigningKey(kid=entry["kid"], alg=entry["alg"], status=entry["status"], private_key=private_key)
+            keys[key.kid] = key
+            if key.status == "active":
+                active = key
+        if active is None:
+            raise RuntimeError(f"JWT key ring {self.path} has no active key")
+        self._keys, self._active, self._mtime = keys, active, mtime
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                if os.stat(self.path).st_mtime != self._mtime:
+                    self._load()
+            except Exception as e:
+                logger.error(f"JWT key ring reload failed, keeping current keys: {str(e)}")
+
+    def active(self) -> SigningKey:
+        self._maybe_reload()
+        return self._active
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        self._maybe_reload()
+        return self._keys.get(kid)
+
+    def jwks(self) -> dict:
+        self._maybe_reload()
+        return {"keys": [key.public_jwk() for key in self._keys.values()]}
+
+
+# ----------------------------------------
+# Offline rotation CLI
+# ----------------------------------------
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def add_key(document: dict, alg: str, activate: bool = False) -> dict:
+    private_key = generate_private_key(alg)
+    entry = {
+        "kid": f"{datetime.now(timezone.utc):%Y%m%d}-{uuid.uuid4().hex[:8]}",
+        "alg": alg,
+        "status": "pending",
+        "created_at": _now(),
+        "retired_at": None,
+        "private_key": private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode("utf-8"),
+    }
+    document["keys"].append(entry)
+    if activate:
+        activate_key(document, entry["kid"])
+    return entry
+
+
+def activate_key(document: dict, kid: str):
+    keys = {entry["kid"]: entry for entry in document["keys"]}
+    if kid not in keys:
+        raise ValueError(f"No key with kid '{kid}'")
+    for entry in document["keys"]:
+        if entry["status"] == "active" and entry["kid"] != kid:
+            entry["status"] = "retiring"
+            entry["retired_at"] = _now()
+    keys[kid]["status"] = "active"
+    keys[kid]["retired_at"] = None
+
+
+def prune_keys(document: dict, older_than: float) -> List[str]:
+    """Drop retiring keys retired more than older_than seconds ago."""
+    now = datetime.now(timezone.utc)
+    kept, dropped = [], []
+    for entry in document["keys"]:
+        retired_at = entry.get("retired_at")
+        if (
+            entry["status"] == "retiring"
+            and retired_at
+            and (now - datetime.fromisoformat(retired_at)).total_seconds() > older_than
+        ):
+            dropped.append(entry["kid"])
+        else:
+            kept.append(entry)
+    document["keys"] = kept
+    return dropped
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m core.keyring", description="Manage the JWT signing key ring")
+    parser.add_argument("--path", default=os.environ.get("JWT_KEYRING_PATH"), help="key file (default: $JWT_KEYRING_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="generate a new pending key")
+    add.add_argument("--alg", choices=SUPPORTED_ALGORITHMS, default="ES256")
+    add.add_argument("--activate", action="store_true", help="make it the signing key immediately")
+
+    activate = commands.add_parser("activate", help="make a key the signing key; the current one starts retiring")
+    activate.add_argument("kid")
+
+    prune = commands.add_parser("prune", help="remove retiring keys")
+    prune.add_argument("--older-than", type=float, required=True,
+                       help="seconds since retirement; use at least the access token lifetime")
+
+    commands.add_parser("list", help="show keys")
+
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error("--path or JWT_KEYRING_PATH is required")
+
+    document = load_document(args.path)
+    if args.command == "add":
+        entry = add_key(document, args.alg, activate=args.activate)
+        save_document(args.path, document)
+        print(f"Added {entry['alg']} key {entry['kid']} ({'active' if args.activate else 'pending'})")
+    elif args.command == "activate":
+        activate_key(document, args.kid)
+        save_document(args.path, document)
+        print(f"Activated {args.kid}")
+    elif args.command == "prune":
+        dropped = prune_keys(document, args.older_than)
+        save_document(args.path, document)
+        print(f"Removed {len(dropped)} keys: {', '.join(dropped) or '-'}")
+    else:
+        for entry in document["keys"]:
+            print(f"{entry['kid']}  {entry['alg']:<6} {entry['status']:<9} created {entry['created_at']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import threading
+from typing import Dict, Optional, Sequence
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters, gauges and timing
+    summaries, optionally with cumulative histogram buckets).
+    Exposed as JSON on GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, dict] = {}
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Optional[Sequence[float]] = None):
+        with self._lock:
+            timing = self._timings.setdefault(
+                name, {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0}
+            )
+            timing["count"] += 1
+            timing["sum"] += value
+            timing["max"] = max(timing["max"], value)
+            timing["last"] = value
+            if buckets:
+                # Cumulative, as in Prometheus: le_X counts observations <= X
+                counts = timing.setdefault("buckets", {f"le_{b:g}": 0 for b in buckets})
+                for bound in buckets:
+                    if value <= bound:
+                        counts[f"le_{bound:g}"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {
+                    name: {k: dict(v) if isinstance(v, dict) else v for k, v in t.items()}
+                    for name, t in self._timings.items()
+                },
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,246 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Identifier rules read the JSON body; larger bodies are not inspected
+MAX_INSPECTED_BODY_BYTES = 64 * 1024
+
+
+@dataclass
+class RateLimitRule:
+    method: str
+    path: str
+    scope: str  # 'ip' or 'identifier'
+    limit: int
+    window: int  # seconds
+
+
+def parse_rules(config: Dict[str, List[str]]) -> List[RateLimitRule]:
+    """
+    Parse RATE_LIMITS: {"POST /v1/auth/verify-otp": ["ip:30/60", "identifier:5/300"]}
+    means 30 requests per 60s per client IP and 5 per 300s per identifier.
+    """
+    rules = []
+    for route, limits in config.items():
+        method, path = route.split(" ", 1)
+        for spec in limits:
+            scope, rate = spec.split(":", 1)
+            limit, window = rate.split("/", 1)
+            if scope not in ("ip", "identifier"):
+                raise ValueError(f"Unknown rate limit scope '{scope}' for {route}")
+            rules.append(RateLimitRule(method.upper(), path, scope, int(limit), int(window)))
+    return rules
+
+
+class RateLimitBackend:
+    """
+    Sliding-window counters. hit() counts one request against key and
+    returns (allowed, retry_after_seconds). The estimate for the current
+    window is current + previous * (share of the previous window still
+    inside the sliding window), which needs two counters per key.
+    """
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _decide(current: int, previous: int, limit: int, window: int, now: float) -> Tuple[bool, float]:
+        elapsed = now % window
+        estimate = current + previous * (1 - elapsed / window)
+        if estimate <= limit:
+            return True, 0.0
+        return False, window - elapsed
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process counters, LRU-bounded to max_keys. Limits are per worker process."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (window index, current count, previous count)
+        self._windows: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        stored_index, current, previous = self._windows.get(key, (index, 0, 0))
+        if stored_index == index - 1:
+            current, previous = 0, current
+        elif stored_index != index:
+            current, previous = 0, 0
+        current += 1
+
+        self._windows[key] = (index, current, previous)
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return self._decide(current, previous, limit, window, now)
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Redis (or any Redis-protocol server) counters, shared by all workers."""
+
+    def __init__(self, url: str, prefix: str = "xsnapster:ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, window * 2)
+            pipe.get(f"{self.prefix}{key}:{index - 1}")
+            current, _, previous = await pipe.execute()
+        return self._decide(int(current), int(previous or 0), limit, window, now)
+
+
+class RateLimiter:
+    def __init__(self, rules: List[RateLimitRule], backend: Optional[RateLimitBackend], trust_forwarded_for: bool):
+        self.backend = backend
+        self.trust_forwarded_for = trust_forwarded_for
+        self._rules: Dict[Tuple[str, str], List[RateLimitRule]] = {}
+        for rule in rules:
+            self._rules.setdefault((rule.method, rule.path), []).append(rule)
+
+    def rules_for(self, method: str, path: str) -> List[RateLimitRule]:
+        if self.backend is None:
+            return []
+        return self._rules.get((method, path.rstrip("/") or "/"), [])
+
+    def client_ip(self, scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def check(self, rule: RateLimitRule, subject: str) -> Tuple[bool, float]:
+        key = f"{rule.method}:{rule.path}:{rule.scope}:{rule.window}:{subject}"
+        try:
+            return await self.backend.hit(key, rule.limit, rule.window)
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            logger.warning(f"Rate limit check failed for {rule.path}: {str(e)}")
+            return True, 0.0
+
+
+def _identifier_from_body(body: bytes) -> Optional[str]:
+    try:
+        identifier = json.loads(body).get("identifier")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(identifier, str) or not identifier.strip():
+        return None
+    return identifier.strip().lower()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing the configured limits before routing, so
+    rejected requests never open a database session. Identifier rules read
+    the JSON body's "identifier" field; the body is then replayed to the app.
+    A request to such a route whose identifier cannot be read (body too
+    large, not JSON, no identifier) is rejected rather than let past the rule.
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def _read_body(self, receive) -> Tuple[bytes, list]:
+        messages, body, size = [], [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            body.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False) or size > MAX_INSPECTED_BODY_BYTES:
+                break
+        return b"".join(body), messages
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rules = self.limiter.rules_for(scope["method"], scope["path"])
+        if not rules:
+            return await self.app(scope, receive, send)
+
+        identifier = None
+        if any(rule.scope == "identifier" for rule in rules):
+            body, buffered = await self._read_body(receive)
+            if len(body) > MAX_INSPECTED_BODY_BYTES:
+                metrics.inc("rate_limit.rejected.unreadable_identifier")
+                response = _error_response(413, "PAYLOAD_TOO_LARGE", "Request body too large")
+                return await response(scope, receive, send)
+            identifier = _identifier_from_body(body)
+            if identifier is None:
+                metrics.inc("rate_limit.rejected.unreadable_identifier")
+                response = _error_response(400, "IDENTIFIER_REQUIRED", "A JSON body with an identifier is required")
+                return await response(scope, receive, send)
+
+            async def replay():
+                if buffered:
+                    return buffered.pop(0)
+                return await receive()
+            receive = replay
+
+        for rule in rules:
+            subject = self.limiter.client_ip(scope) if rule.scope == "ip" else identifier
+            allowed, retry_after = await self.limiter.check(rule, subject)
+            if not allowed:
+                metrics.inc(f"rate_limit.rejected.{rule.scope}")
+                response = _error_response(
+                    429,
+                    "RATE_LIMITED",
+                    "Too many requests. Please try again later.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+                return await response(scope, receive, send)
+
+        return await self.app(scope, receive, send)
+
+
+def _error_response(status_code: int, error_code: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Error body in the shape of core.error_handlers; the middleware runs outside those handlers"""
+    return JSONResponse(
+        status_code=status_code,
+        content={"success": False, "error_code": error_code, "message": message},
+        headers=headers,
+    )
+
+
+def _build_backend() -> Optional[RateLimitBackend]:
+    backend = settings.RATE_LIMIT_BACKEND.lower()
+    if backend == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL or settings.CACHE_REDIS_URL)
+    if backend == "memory":
+        return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    return None
+
+
+rate_limiter = RateLimiter(
+    rules=parse_rules(settings.RATE_LIMITS),
+    backend=_build_backend(),
+    trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+)
@@ -1,9 +1,14 @@
+import hashlib
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, status
 from core.config import settings  # assumes SECRET_KEY, JWT settings
+from core.keyring import KeyRing
 
+# Asymmetric signing for access tokens when a key ring is configured;
+# otherwise they are signed with SECRET_KEY as before
+key_ring = KeyRing(settings.JWT_KEYRING_PATH, settings.JWT_KEYRING_RELOAD_SECONDS) if settings.JWT_KEYRING_PATH else None
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -12,6 +17,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
+    if key_ring is not None:
+        key = key_ring.active()
+        return jwt.encode(to_encode, key.private_key, algorithm=key.alg, headers={"kid": key.kid})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -22,11 +30,34 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.REFRESH_SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def verify_token(token: str, secret_key: str):
+def token_digest(token: str) -> bytes:
+    """SHA-256 of a token, as stored in refresh_tokens.token_hash"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+def _decode(token: str, key, algorithms: list):
     try:
-        payload = jwt.decode(token, secret_key, algorithms=[settings.ALGORITHM])
-        return payload
+        return jwt.decode(token, key, algorithms=algorithms)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+def verify_token(token: str, secret_key: str):
+    return _decode(token, secret_key, [settings.ALGORITHM])
+
+def verify_access_token_signature(token: str):
+    """
+    Verify an access token: by its kid against the key ring, or with
+    SECRET_KEY for tokens signed before the key ring was enabled.
+    """
+    if key_ring is not None:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        key = key_ring.get(kid) if kid else None
+        if key is not None:
+            return _decode(token, key.public_key, [key.alg])
+        if kid or not settings.JWT_ACCEPT_LEGACY_HS_TOKENS:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return verify_token(token, settings.SECRET_KEY)
@@ -1,20 +1,126 @@
-from sqlalchemy import create_engine
+import ssl
+from typing import Optional, Tuple, Union
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from db.base import Base
+from db.instrumentation import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    instrument_pool,
+    instrument_queries,
+)
+
+
+# libpq TLS parameters; asyncpg rejects them as keywords and takes one ssl argument instead
+LIBPQ_SSL_PARAMS = ("sslmode", "sslrootcert", "sslcert", "sslkey")
+
+
+def _asyncpg_ssl(
+    sslmode: Optional[str] = None,
+    sslrootcert: Optional[str] = None,
+    sslcert: Optional[str] = None,
+    sslkey: Optional[str] = None,
+) -> Union[str, ssl.SSLContext]:
+    """asyncpg's ssl argument for libpq-style settings: the mode name, or a context when files are given."""
+    mode = sslmode or "prefer"
+    if mode == "disable" or not (sslrootcert or sslcert):
+        return mode
+
+    context = ssl.create_default_context(cafile=sslrootcert)
+    if mode != "verify-full":
+        context.check_hostname = False
+    if not sslrootcert and mode != "verify-ca":
+        # libpq only verifies the server for require/prefer/allow when a root cert is given
+        context.verify_mode = ssl.CERT_NONE
+    if sslcert:
+        context.load_cert_chain(sslcert, sslkey)
+    return context
+
+
+def to_async_url(db_url: str) -> Tuple[str, dict]:
+    """
+    Swap the sync driver in a Postgres URL for asyncpg. TLS query parameters
+    (sslmode=require, ...) are moved out of the URL into the connect_args
+    returned alongside it.
+    """
+    url = make_url(db_url)
+    query = dict(url.query)
+    ssl_params = {name: query.pop(name) for name in LIBPQ_SSL_PARAMS if name in query}
+    url = url.set(drivername="postgresql+asyncpg", query=query)
+    connect_args = {"ssl": _asyncpg_ssl(**ssl_params)} if ssl_params else {}
+    return url.render_as_string(hide_password=False), connect_args
 
 
 class Database:
-    def __init__(self, db_url: str):
-        self.engine = create_engine(db_url)
+    def __init__(
+        self,
+        db_url: str,
+        async_db_url: Optional[str] = None,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_pre_ping: bool = True,
+        pool_recycle: int = -1,
+        pool_use_lifo: bool = False,
+        statement_timeout_ms: int = 0,
+    ):
+        pool_options = dict(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+            pool_use_lifo=pool_use_lifo,
+        )
+
+        sync_connect_args = {}
+        async_connect_args = {}
+        if statement_timeout_ms:
+            sync_connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+            async_connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+
+        self.engine = create_engine(
+            db_url,
+            connect_args=sync_connect_args,
+            poolclass=InstrumentedQueuePool,
+            **pool_options,
+        )
         self.SessionLocal = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
 
+        async_url, ssl_connect_args = to_async_url(async_db_url or db_url)
+        async_connect_args.update(ssl_connect_args)
+        self.async_engine = create_async_engine(
+            async_url,
+            connect_args=async_connect_args,
+            poolclass=InstrumentedAsyncQueuePool,
+            **pool_options,
+        )
+        self.AsyncSessionLocal = async_sessionmaker(
+            bind=self.async_engine, autoflush=False, expire_on_commit=False
+        )
+
+        for engine in (self.engine, self.async_engine.sync_engine):
+            instrument_pool(engine.pool)
+            instrument_queries(engine)
+
     def create_tables(self):
+        # pg_trgm must exist before the trigram indexes on products are created
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         Base.metadata.create_all(bind=self.engine)
 
     def get_session(self):
         return self.SessionLocal()
 
+    def get_async_session(self):
+        return self.AsyncSessionLocal()
+
     def close(self):
         self.engine.dispose()
+
+    async def close_async(self):
+        await self.async_engine.dispose()
@@ -0,0 +1,132 @@
+import contextvars
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _record_wait(pool, started: float):
+    metrics.observe(f"db.{pool.metrics_name}.pool.wait_seconds", time.monotonic() - started, buckets=POOL_WAIT_BUCKETS)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    metrics_name = "sync"
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            _record_wait(self, started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            _record_wait(self, started)
+
+
+def instrument_pool(pool):
+    """Keep checked-out / overflow gauges current for an instrumented pool."""
+    name = pool.metrics_name
+
+    def update_gauges(*_):
+        metrics.set_gauge(f"db.{name}.pool.checked_out", pool.checkedout())
+        metrics.set_gauge(f"db.{name}.pool.overflow", max(pool.overflow(), 0))
+        metrics.set_gauge(f"db.{name}.pool.idle", pool.checkedin())
+
+    def on_checkout(*args):
+        metrics.inc(f"db.{name}.pool.checkouts")
+        update_gauges()
+
+    event.listen(pool, "checkout", on_checkout)
+    event.listen(pool, "checkin", update_gauges)
+    event.listen(pool, "connect", lambda *_: metrics.inc(f"db.{name}.pool.connects"))
+
+
+class RequestQueryStats:
+    """Queries issued while serving one request."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+
+# Shared with the threadpool (sync routes) and SQLAlchemy's asyncio greenlets,
+# which both run in the request's context
+_request_stats: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def instrument_queries(engine):
+    """Count and time every statement against the current request, if any."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _request_stats.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _request_stats.get()
+        if stats is None:
+            return
+        started = conn.info.get("query_started")
+        if started:
+            stats.seconds += time.perf_counter() - started.pop()
+        stats.count += 1
+        stats.statements[statement] += 1
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware recording per-request query count and database time.
+    With warn_threshold > 0 (meant for development), a request issuing more
+    queries than that is logged with its most repeated statement, which is
+    how N+1 loops show up.
+    """
+
+    def __init__(self, app, warn_threshold: int = 0):
+        self.app = app
+        self.warn_threshold = warn_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestQueryStats()
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_stats.reset(token)
+            if stats.count:
+                metrics.observe("db.request.queries", stats.count)
+                metrics.observe("db.request.query_seconds", stats.seconds)
+            if self.warn_threshold and stats.count > self.warn_threshold:
+                statement, repeats = stats.statements.most_common(1)[0]
+                metrics.inc("db.request.query_warnings")
+                logger.warning(
+                    f"{scope['method']} {scope['path']} issued {stats.count} queries "
+                    f"({stats.seconds * 1000:.1f} ms); most repeated ({repeats}x): {' '.join(statement.split())[:300]}"
+                )
@@ -5,7 +5,17 @@ from db.base import Base
 
 target_metadata = Base.metadata
 
-db = Database(settings.DATABASE_URL)
+db = Database(
+    settings.DATABASE_URL,
+    async_db_url=settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_use_lifo=settings.DB_POOL_USE_LIFO,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+)
 
 
 def get_db():
@@ -16,9 +26,11 @@ def get_db():
         session.close()
 
 
+async def get_async_db():
+    async with db.get_async_session() as session:
+        yield session
+
+
 def get_db_session():
-    session = db.get_session()
-    try:
-        return session
-    finally:
-        session.close()
+    """Open a session for use outside a request. The caller must close it."""
+    return db.get_session()
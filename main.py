@@ -1,22 +1,57 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException, status
+import json
 from db.base import Base
 from db.session import db, get_db
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+from contextlib import asynccontextmanager
 from api.routes.v1 import auth, products
 from core.error_handlers import setup_exception_handlers
+from core.metrics import metrics
+from core.http_cache import conditional_json_response
+from core.security import key_ring
+from core.rate_limit import RateLimitMiddleware, rate_limiter
+from db.instrumentation import QueryStatsMiddleware
+from services.view_counter import view_counter
+from services.s3_service import s3_service
+from services.showcase_service import showcase
+from services.otp_delivery import otp_delivery
+from services.janitor import janitor
+from core.config import settings
 
 
 db.create_tables()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    view_counter.start()
+    showcase.start()
+    otp_delivery.start()
+    if settings.JANITOR_ENABLED:
+        janitor.start()
+    yield
+    await janitor.stop()
+    await otp_delivery.stop()
+    await showcase.stop()
+    await view_counter.stop()
+    s3_service.shutdown()
+    await db.close_async()
+    db.close()
+
+
 app = FastAPI(
     title="xSnapster backend server",
     description="Backend APIs for ecommerce platform xSnapster",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 setup_exception_handlers(app)
 
+app.add_middleware(QueryStatsMiddleware, warn_threshold=settings.DB_WARN_QUERIES_PER_REQUEST)
+# Added before CORS so CORS stays outermost and 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -31,3 +66,17 @@ app.include_router(products.router)
 @app.get("/")
 def root():
     return {"message": "xSnapster API is running 🚀"}
+
+
+@app.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    """Public keys for verifying access tokens without calling this API"""
+    if key_ring is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No signing keys configured")
+    content = json.dumps(key_ring.jwks(), separators=(",", ":")).encode("utf-8")
+    return conditional_json_response(request, content, settings.JWKS_CACHE_CONTROL)
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
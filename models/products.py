@@ -1,14 +1,40 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, func, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, func, ForeignKey, Computed, Index
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, JSONB
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 
 
 from db.base import Base
 
 
+# Text search configuration used both for the stored search_vector and for
+# queries against it; they must match for the GIN index to be used.
+SEARCH_TEXT_CONFIG = "english"
+
+PRODUCT_SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(one_liner, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(category, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(description, '')), 'C')"
+)
+
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        # pg_trgm indexes: typo-tolerant title matching and indexable ILIKE '%term%'
+        Index("ix_products_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_products_category_trgm", "category", postgresql_using="gin", postgresql_ops={"category": "gin_trgm_ops"}),
+        Index("ix_products_subcategory_trgm", "subcategory", postgresql_using="gin", postgresql_ops={"subcategory": "gin_trgm_ops"}),
+        # Prefix scans for slug allocation (slug LIKE 'base-%')
+        Index("ix_products_slug_pattern", "slug", postgresql_ops={"slug": "text_pattern_ops"}),
+        # Keyset pagination: one (sort key, id) index per sort (services.product_service.KEYSET_SORT_KEYS)
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_discounted_price_id", text("coalesce(discounted_price, price)"), "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_title_id", "title", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -16,36 +42,44 @@ class Product(Base):
     one_liner = Column(String(255), nullable=True)
     description = Column(Text, nullable=True)
     image_links = Column(ARRAY(String), nullable=True)  
+    image_variants = Column(JSONB, default=list, server_default=text("'[]'::jsonb"), nullable=False)  # one variant manifest per image_links entry
     price = Column(Float, nullable=False)
     discounted_price = Column(Float, nullable=True)
     category = Column(String(100), index=True, nullable=True)
     subcategory = Column(String(100), index=True, nullable=True)
     dimensions = Column(String(100), nullable=True)  # e.g., "10x20x15 cm"  should include all 3
     is_active = Column(Boolean, default=True, nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed(PRODUCT_SEARCH_VECTOR_SQL, persisted=True)))  # maintained by Postgres
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     analytics = relationship("ProductAnalytics", back_populates="product", uselist=False)
 
-#cateogry apis
-# top 4 products for each caregorry api
-
 
 
 class ProductAnalytics(Base):
     __tablename__ = "product_analytics"
+    __table_args__ = (
+        # Keyset pagination by analytics: one (column, product_id) index per sort
+        Index("ix_product_analytics_view_count_product_id", "view_count", "product_id"),
+        Index("ix_product_analytics_purchase_count_product_id", "purchase_count", "product_id"),
+        Index("ix_product_analytics_rating_product_id", "rating", "product_id"),
+        Index("ix_product_analytics_review_count_product_id", "review_count", "product_id"),
+        Index("ix_product_analytics_stock_count_product_id", "stock_count", "product_id"),
+        Index("ix_product_analytics_wishlist_count_product_id", "wishlist_count", "product_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, unique=True, index=True)  # one row per product, created with it
     
-    view_count = Column(Integer, default=0, nullable=False)
-    purchase_count = Column(Integer, default=0, nullable=False)
+    view_count = Column(Integer, default=0, server_default="0", nullable=False)
+    purchase_count = Column(Integer, default=0, server_default="0", nullable=False)
     last_purchased_at = Column(DateTime(timezone=True), nullable=True)
-    rating = Column(Float, default=0.0)
-    review_count = Column(Integer, default=0)
-    stock_count = Column(Integer, default=0)
-    wishlist_count = Column(Integer, default=0)
+    rating = Column(Float, default=0.0, server_default="0", nullable=False)
+    review_count = Column(Integer, default=0, server_default="0", nullable=False)
+    stock_count = Column(Integer, default=0, server_default="0", nullable=False)
+    wishlist_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timedelta
@@ -7,10 +7,17 @@ from db.base import Base
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Janitor purge: expired tokens, and revoked ones past the grace period
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+        Index("ix_refresh_tokens_revoked_created_at", "created_at", postgresql_where=text("is_revoked")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    token = Column(Text, unique=True, nullable=False)
+    # SHA-256 of the JWT; the token itself is never stored
+    token_hash = Column(LargeBinary(32), unique=True, nullable=False)
+    jti = Column(String(32), nullable=True)  # JWT ID claim; NULL for tokens issued before it existed
     is_revoked = Column(Boolean, default=False)
     user_agent = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
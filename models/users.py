@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -30,6 +30,12 @@ class User(Base):
 
 class OTP(Base):
     __tablename__ = "otps"
+    __table_args__ = (
+        # Active-OTP lookup per user (request_otp); used OTPs are left out of the index
+        Index("ix_otps_user_active", "user_id", text("created_at DESC"), postgresql_where=text("is_used = false")),
+        # Janitor purge of expired OTPs
+        Index("ix_otps_expires_at", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -39,6 +45,12 @@ class OTP(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Reported back by the delivery worker: 'queued', 'retrying', 'sent' or 'failed'
+    delivery_status = Column(String, default="queued", nullable=False, server_default="queued")
+    delivery_attempts = Column(Integer, default=0, nullable=False, server_default="0")
+    delivery_error = Column(String, nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
     user = relationship("User", back_populates="otps")
 
     @staticmethod
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr, Field
 
 class OTPVerifyRequest(BaseModel):
@@ -19,4 +20,15 @@ class OTPVerifyRequest(BaseModel):
 class AuthResponse(BaseModel):
     access_token: str
     token_type: str
-    user: dict
\ No newline at end of file
+    user: dict
+
+class CurrentUser(BaseModel):
+    """Snapshot of the authenticated user, as cached by get_current_user"""
+    id: str
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    is_verified: bool = False
+    is_active: bool = True
+
+    class Config:
+        from_attributes = True
@@ -18,6 +18,49 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     pass
 
+# Partial update (PATCH): only the fields sent are changed; null clears a field
+class ProductUpdate(BaseModel):
+    title: Optional[str] = None
+    one_liner: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    discounted_price: Optional[float] = None
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    dimensions: Optional[str] = None
+    slug: Optional[str] = None
+    is_active: Optional[bool] = None
+    image_links: Optional[List[str]] = None  # existing images to keep, in order; the rest are deleted
+
+
+class ProductImportError(BaseModel):
+    line: int  # line of the row in the source file
+    error: str
+
+
+class ProductImportReport(BaseModel):
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: List[ProductImportError] = []  # first PRODUCT_IMPORT_MAX_REPORTED_ERRORS only
+    errors_truncated: bool = False
+
+
+class ImageVariant(BaseModel):
+    name: str  # e.g. thumb, card, detail
+    format: str  # webp, avif
+    width: int
+    height: int
+    bytes: int
+    url: str
+
+
+class ImageManifest(BaseModel):
+    original: str
+    variants: List[ImageVariant] = []
+
+
 # Response schema
 class ProductResponse(BaseModel):
     id: int
@@ -25,6 +68,7 @@ class ProductResponse(BaseModel):
     one_liner: Optional[str]
     description: Optional[str]
     image_links: List[str] = []
+    image_variants: List[ImageManifest] = []
     price: float
     discounted_price: Optional[float]
     category: Optional[str]
@@ -58,5 +102,26 @@ class PaginatedProducts(BaseModel):
     pages: int
     data: List[ProductResponse]  # list of products
 
+    class Config:
+        from_attributes = True
+
+
+class ShowcaseCategory(BaseModel):
+    category: str
+    products: List[ProductResponse]
+
+
+class ShowcaseResponse(BaseModel):
+    refreshed_at: datetime
+    categories: List[ShowcaseCategory]
+
+
+class CursorPaginatedProducts(BaseModel):
+    limit: int
+    total: Optional[int] = None  # only counted when include_total=true
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    data: List[ProductResponse]
+
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Microbenchmark of per-request authentication overhead (core.auth).
+
+Times, per call:
+- signature: verifying an access token's signature (what every request
+  paid before the claims cache);
+- claims_hit: verify_access_token answered from the claims cache;
+- dependency_warm: get_current_user with both caches warm, the common case;
+- me_request: a whole GET /v1/auth/me through FastAPI routing (auth
+  router only, no middleware), caches warm;
+- user_query (--user-id): the User lookup a snapshot-cache miss costs;
+  needs the database and an existing user.
+
+Tokens are signed like real ones (key ring or SECRET_KEY, as configured).
+
+    python -m scripts.bench_auth
+    python -m scripts.bench_auth --iterations 50000 --user-id <id>
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+from fastapi import FastAPI
+from fastapi.security import HTTPAuthorizationCredentials
+
+from api.routes.v1 import auth as auth_routes
+from core import auth
+from core.security import create_access_token, verify_access_token_signature
+from db.session import db
+from schemas.auth import CurrentUser
+
+
+def _per_call(total_ns: int, iterations: int) -> float:
+    """Microseconds per call"""
+    return round(total_ns / iterations / 1000, 2)
+
+
+def time_sync(func: Callable[[], object], iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return _per_call(time.perf_counter_ns() - started, iterations)
+
+
+async def time_async(func: Callable[[], Awaitable[object]], iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        await func()
+    return _per_call(time.perf_counter_ns() - started, iterations)
+
+
+async def run(iterations: int, user_id: Optional[str]) -> dict:
+    subject = user_id or f"bench-{uuid.uuid4().hex}"
+    token = create_access_token({"sub": subject})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    results = {"iterations": iterations}
+
+    results["signature_us"] = time_sync(lambda: verify_access_token_signature(token), iterations)
+
+    auth.verify_access_token(token)  # fills the claims cache
+    results["claims_hit_us"] = time_sync(lambda: auth.verify_access_token(token), iterations)
+
+    if user_id:
+        async def load_uncached():
+            auth.user_cache.invalidate(user_id)
+            return await auth.load_user_snapshot(user_id)
+
+        # Round trips dominate; a tenth of the iterations is plenty
+        results["user_query_us"] = await time_async(load_uncached, max(1, iterations // 10))
+    else:
+        auth.user_cache.put(CurrentUser(id=subject, email="bench@example.com", is_verified=True))
+
+    results["dependency_warm_us"] = await time_async(lambda: auth.get_current_user(credentials), iterations)
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.get("/v1/auth/me", headers=headers)
+        response.raise_for_status()
+        results["me_request_us"] = await time_async(lambda: client.get("/v1/auth/me", headers=headers), iterations // 10 or 1)
+
+    await db.close_async()
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_auth", description="Time per-request auth overhead")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--user-id", help="existing user to time the uncached User lookup with (needs the database)")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(asyncio.run(run(args.iterations, args.user_id)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
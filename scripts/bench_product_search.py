@@ -0,0 +1,184 @@
+"""
+Product search benchmark: the old title ILIKE '%term%' filter against the
+full-text + trigram search used by listings (services.search_service).
+
+Synthetic products are generated server-side into a scratch schema
+(bench_search) with the same table definition and indexes as products, so
+the real catalog is never touched. Each search runs like a listing page:
+a count plus the first page, timed from the client.
+
+The ILIKE baseline runs with bitmap scans disabled: the trigram index on
+title postdates that query, and without it ILIKE '%term%' was a
+sequential scan.
+
+    python -m scripts.bench_product_search --rows 1000000
+    python -m scripts.bench_product_search --reuse --term "blue shirt" --explain
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import MetaData, desc, func, select, text
+from sqlalchemy.schema import CreateSchema, DropSchema
+
+from db.session import db
+from models.products import Product
+from services.search_service import product_search_filter, product_search_rank
+
+BENCH_SCHEMA = "bench_search"
+PAGE_SIZE = 10
+
+logger = logging.getLogger(__name__)
+
+ADJECTIVES = ["classic", "slim", "relaxed", "vintage", "premium", "everyday", "oversized", "cropped", "soft", "rugged"]
+COLORS = ["black", "white", "blue", "navy", "olive", "red", "grey", "beige", "green", "yellow"]
+MATERIALS = ["cotton", "linen", "wool", "denim", "leather", "silk", "fleece", "canvas", "ceramic", "oak"]
+NOUNS = ["shirt", "tshirt", "hoodie", "jacket", "jeans", "sweater", "mug", "lamp", "backpack", "sneakers"]
+CATEGORIES = ["tops", "bottoms", "outerwear", "home", "accessories", "footwear"]
+
+DEFAULT_TERMS = ["shirt", "blue cotton shirt", "vintage leather jacket", "oak lamp", "sweter"]
+
+
+def _pick(words: List[str]) -> str:
+    """SQL picking a random element of words"""
+    quoted = ", ".join(f"'{word}'" for word in words)
+    return f"(ARRAY[{quoted}])[1 + floor(random() * {len(words)})::int]"
+
+
+SEED_SQL = f"""
+INSERT INTO {BENCH_SCHEMA}.products (title, slug, one_liner, description, price, category, is_active, image_variants)
+SELECT t.title,
+       'bench-' || t.i,
+       initcap({_pick(ADJECTIVES)}) || ' ' || {_pick(NOUNS)} || ' for every day',
+       'Made from ' || {_pick(MATERIALS)} || ' in ' || {_pick(COLORS)} || '. Pairs well with a '
+           || {_pick(COLORS)} || ' ' || {_pick(NOUNS)} || '. Item ' || t.i || '.',
+       round((5 + random() * 195)::numeric, 2),
+       {_pick(CATEGORIES)},
+       random() > 0.05,
+       '[]'::jsonb
+FROM (
+    SELECT i,
+           initcap({_pick(ADJECTIVES)} || ' ' || {_pick(COLORS)} || ' ' || {_pick(MATERIALS)} || ' ' || {_pick(NOUNS)}) AS title
+    FROM generate_series(1, :rows) AS i
+) AS t
+"""
+
+
+def create_bench_table(conn, rows: int):
+    """(Re)create the scratch schema and fill it; indexes are built after the load"""
+    conn.execute(DropSchema(BENCH_SCHEMA, cascade=True, if_exists=True))
+    conn.execute(CreateSchema(BENCH_SCHEMA))
+    table = Product.__table__.to_metadata(MetaData(), schema=BENCH_SCHEMA)
+    indexes = list(table.indexes)
+    table.indexes.clear()
+    table.create(conn)
+
+    started = time.monotonic()
+    conn.execute(text("SELECT setseed(0.42)"))
+    conn.execute(text(SEED_SQL), {"rows": rows})
+    logger.info(f"Loaded {rows} products in {time.monotonic() - started:.1f}s")
+
+    started = time.monotonic()
+    for index in indexes:
+        index.create(conn)
+    conn.execute(text(f"ANALYZE {BENCH_SCHEMA}.products"))
+    logger.info(f"Built {len(indexes)} indexes in {time.monotonic() - started:.1f}s")
+
+
+def ilike_queries(term: str):
+    where = [Product.is_active.is_(True), Product.title.ilike(f"%{term}%")]
+    count = select(func.count()).select_from(Product).where(*where)
+    page = select(Product.id, Product.title).where(*where).order_by(desc(Product.id)).limit(PAGE_SIZE)
+    return count, page
+
+
+def search_queries(term: str):
+    where = [Product.is_active.is_(True), product_search_filter(term)]
+    count = select(func.count()).select_from(Product).where(*where)
+    page = (
+        select(Product.id, Product.title)
+        .where(*where)
+        .order_by(desc(product_search_rank(term)), desc(Product.id))
+        .limit(PAGE_SIZE)
+    )
+    return count, page
+
+
+# name -> (queries for a term, settings applied while they run)
+PATHS: Dict[str, tuple] = {
+    "ilike": (ilike_queries, {"enable_bitmapscan": "off"}),
+    "search": (search_queries, {}),
+}
+
+
+def time_path(conn, build: Callable, gucs: Dict[str, str], term: str, repeat: int, explain: bool) -> dict:
+    count_query, page_query = build(term)
+    with conn.begin():
+        for name, value in gucs.items():
+            conn.execute(text(f"SET LOCAL {name} = {value}"))
+        if explain:
+            compiled = page_query.compile(conn)
+            plan = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", compiled.params).scalars().all()
+            logger.info("\n".join(plan))
+
+        timings = []
+        matches = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matches = conn.execute(count_query).scalar_one()
+            conn.execute(page_query).all()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        "matches": matches,
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_product_search", description="Compare ILIKE with full-text search")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--reuse", action="store_true", help=f"reuse the data already in {BENCH_SCHEMA}")
+    parser.add_argument("--keep", action="store_true", help=f"keep {BENCH_SCHEMA} afterwards (for --reuse)")
+    parser.add_argument("--term", action="append", dest="terms", help="search term (repeatable)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per term and path")
+    parser.add_argument("--explain", action="store_true", help="print the plan of each page query")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    results = {}
+    with db.engine.connect() as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.commit()
+        try:
+            if not args.reuse:
+                with conn.begin():
+                    create_bench_table(conn, args.rows)
+            # Unqualified "products" in the queries resolves to the scratch table;
+            # public stays on the path for pg_trgm
+            conn.execute(text(f"SET search_path TO {BENCH_SCHEMA}, public"))
+            rows = conn.execute(select(func.count()).select_from(Product)).scalar_one()
+            conn.commit()
+
+            for term in args.terms or DEFAULT_TERMS:
+                results[term] = {
+                    name: time_path(conn, build, gucs, term, args.repeat, args.explain)
+                    for name, (build, gucs) in PATHS.items()
+                }
+                logger.info(f"{term!r}: {json.dumps(results[term])}")
+        finally:
+            if not args.keep:
+                with conn.begin():
+                    conn.execute(DropSchema(BENCH_SCHEMA, cascade=True, if_exists=True))
+
+    print(json.dumps({"rows": rows, "page_size": PAGE_SIZE, "results": results}, indent=2))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Load test for POST /v1/auth/request-otp against a running server.
+
+Every request uses a fresh identifier, so each one takes the full path:
+user upsert, active-OTP check, OTP insert. With --repeat-share some
+requests reuse an identifier already sent, which exercises the "OTP
+already sent" branch instead.
+
+Start the server with limits and real delivery out of the way:
+
+    RATE_LIMIT_BACKEND=none OTP_EMAIL_PROVIDER=fake uvicorn main:app --workers 4
+
+Before/after: run the same load against a checkout of the old request_otp
+(e.g. `git worktree add ../before <commit>^`) and against this tree, then
+compare the two reports:
+
+    python -m scripts.bench_request_otp --label before --save before.json
+    python -m scripts.bench_request_otp --label after --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+import httpx
+
+ENDPOINT = "/v1/auth/request-otp"
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run(url: str, requests: int, concurrency: int, repeat_share: float, timeout: float) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    issued: List[str] = []
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = 0
+
+    def next_identifier() -> str:
+        nonlocal next_index
+        if issued and random.random() < repeat_share:
+            return random.choice(issued)
+        next_index += 1
+        return f"bench-{run_id}-{next_index}@example.com"
+
+    async def worker(client: httpx.AsyncClient, count: int):
+        for _ in range(count):
+            identifier = next_identifier()
+            started = time.perf_counter()
+            try:
+                response = await client.post(ENDPOINT, json={"identifier": identifier})
+                statuses[str(response.status_code)] += 1
+                if response.status_code == 200:
+                    issued.append(identifier)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        # One request first, so connection set-up and server warm-up are not measured
+        await client.post(ENDPOINT, json={"identifier": f"bench-{run_id}-warmup@example.com"})
+        counts = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, count) for count in counts if count))
+        seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 2),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 0.50), 2),
+            "p95": round(_percentile(latencies, 0.95), 2),
+            "p99": round(_percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def compare(before: dict, after: dict) -> dict:
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    return {
+        "requests_per_second": change(before["requests_per_second"], after["requests_per_second"]),
+        **{
+            f"latency_{name}": change(before["latency_ms"][name], after["latency_ms"][name])
+            for name in ("p50", "p95", "p99")
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_request_otp", description="Load test request-otp")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat-share", type=float, default=0.0,
+                        help="share of requests that reuse an identifier already sent (0-1)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per request, in seconds")
+    parser.add_argument("--label", help="name of this run in the report")
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="report saved by an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.url, args.requests, args.concurrency, args.repeat_share, args.timeout))
+    if args.label:
+        report = {"label": args.label, **report}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["change_vs_" + (baseline.get("label") or "baseline")] = compare(baseline, report)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
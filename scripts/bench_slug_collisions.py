@@ -0,0 +1,142 @@
+"""
+Slug allocation benchmark with heavily colliding titles.
+
+Creates --products products that all have the same title, one path at a
+time, and reports time, statements issued and failures per path:
+- legacy: the old create_product loop, one SELECT per taken slug
+  ("classic-tshirt", "classic-tshirt-1", ...) and no retry on a lost race;
+- create_product: the current allocate-once, insert-and-retry path;
+- import: the same rows through ProductImporter (one slug query per chunk).
+
+--concurrency runs that many creates at once (own session each), which is
+where the legacy loop starts losing races on the unique index. Every path
+gets its own title, so each starts from an empty slug range; all products
+created are deleted at the end.
+
+    python -m scripts.bench_slug_collisions --products 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from slugify import slugify
+from sqlalchemy import event, select, text
+from sqlalchemy.exc import IntegrityError
+
+from db.session import db
+from models.products import Product
+from schemas.products import ProductCreate
+from services.product_import import ProductImporter
+from services.product_service import create_product
+
+PATHS = ("legacy", "create_product", "import")
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+async def legacy_create_product(session, product_data: ProductCreate):
+    """create_product as it was: probe base, base-1, base-2, ... until one is free"""
+    base_slug = slugify(product_data.title)
+    slug = base_slug
+    counter = 1
+    while (await session.execute(select(Product.id).where(Product.slug == slug))).first():
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+
+    now = datetime.utcnow()
+    session.add(Product(
+        title=product_data.title, slug=slug, price=product_data.price,
+        image_links=[], image_variants=[], is_active=True, created_at=now, updated_at=now,
+    ))
+    await session.commit()
+
+
+async def run_creates(path: str, title: str, products: int, concurrency: int) -> int:
+    """Create products one request at a time per worker; returns the failures"""
+    product_data = ProductCreate(title=title, price=10.0)
+    remaining = iter(range(products))
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            async with db.get_async_session() as session:
+                try:
+                    if path == "legacy":
+                        await legacy_create_product(session, product_data)
+                    else:
+                        await create_product(session, product_data, [])
+                except Exception as e:
+                    if not isinstance(e, IntegrityError) and getattr(e, "status_code", None) != 409:
+                        raise
+                    await session.rollback()
+                    failures += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return failures
+
+
+async def run_import(title: str, products: int) -> int:
+    csv_data = "title,price\n" + f"{title},10\n" * products
+    report = await ProductImporter(fetch_images=False).run(io.BytesIO(csv_data.encode()), "csv")
+    return report.failed
+
+
+async def run(products: int, concurrency: int, paths: List[str]) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    counter = StatementCounter(db.async_engine.sync_engine)
+    results = {}
+    try:
+        for path in paths:
+            title = f"Bench Collide {run_id} {path.replace('_', ' ')}"
+            statements_before = counter.count
+            started = time.perf_counter()
+            if path == "import":
+                failures = await run_import(title, products)
+            else:
+                failures = await run_creates(path, title, products, concurrency)
+            seconds = time.perf_counter() - started
+            statements = counter.count - statements_before
+            results[path] = {
+                "seconds": round(seconds, 3),
+                "products_per_second": round(products / seconds, 1) if seconds else 0.0,
+                "statements": statements,
+                "statements_per_product": round(statements / products, 2),
+                "failures": failures,
+            }
+            print(f"{path}: {json.dumps(results[path])}", flush=True)
+    finally:
+        async with db.get_async_session() as session:
+            await session.execute(
+                text("DELETE FROM products WHERE slug LIKE :pattern"), {"pattern": f"bench-collide-{run_id}-%"}
+            )
+            await session.commit()
+        await db.close_async()
+
+    return {"products": products, "concurrency": concurrency, "results": results}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_slug_collisions", description="Benchmark slug allocation")
+    parser.add_argument("--products", type=int, default=500, help="products created per path, all with one title")
+    parser.add_argument("--concurrency", type=int, default=1, help="creates in flight at once (not for import)")
+    parser.add_argument("--path", action="append", choices=PATHS, dest="paths", help="default: all")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(asyncio.run(run(args.products, args.concurrency, args.paths or list(PATHS))), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Peak memory of concurrent product image uploads.
+
+Starts N uploads of an image just under IMAGE_MAX_UPLOAD_BYTES at once
+through s3_service.upload_product_image, the path behind POST
+/v1/products/, and samples the resident set size of this process (intake,
+S3 transfer) and of the image worker processes (decode/resize/encode)
+while they run. Linux only: RSS is read from /proc.
+
+    python -m scripts.bench_upload_rss
+    python -m scripts.bench_upload_rss --uploads 20 --size-mb 10 --no-s3
+    python -m scripts.bench_upload_rss --no-s3 --max-api-growth-mb 2 --max-workers-mb 800
+
+With --max-api-growth-mb / --max-workers-mb it doubles as a check: it exits
+with status 1 if any upload failed or a limit was exceeded.
+
+With --no-s3 the S3 client is replaced by one that reads each file and
+discards it, so no bucket is needed; the memory profile of the upload
+path itself is unchanged.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from core.config import settings
+from services.s3_service import s3_service
+
+SAMPLE_INTERVAL_SECONDS = 0.01
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass  # the process exited between listing and reading
+    return 0
+
+
+def _child_pids(pid: int) -> List[int]:
+    children: List[int] = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            pass
+    return children
+
+
+class RSSSampler(threading.Thread):
+    """Records the peak RSS of this process and the peak total RSS of its children"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_self = 0
+        self.peak_children = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        pid = os.getpid()
+        while not self._stop_event.is_set():
+            self.peak_self = max(self.peak_self, _rss_bytes(pid))
+            self.peak_children = max(self.peak_children, sum(_rss_bytes(child) for child in _child_pids(pid)))
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _DiscardingS3Client:
+    """Stands in for the boto3 client: reads each uploaded file in chunks and drops it"""
+
+    def upload_file(self, path, bucket, key, ExtraArgs=None, Config=None, **kwargs):
+        with open(path, "rb") as f:
+            while f.read(settings.IMAGE_UPLOAD_CHUNK_BYTES):
+                pass
+
+
+def make_image(path: str, size_bytes: int) -> int:
+    """Write a PNG of noise, which does not compress, close to size_bytes"""
+    side = int(math.sqrt(size_bytes / 3))
+    Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(path, format="PNG", compress_level=1)
+    return os.path.getsize(path)
+
+
+def _upload_file(path: str) -> UploadFile:
+    # What the multipart parser hands a route: a file object positioned at 0
+    return UploadFile(
+        file=open(path, "rb"),
+        size=os.path.getsize(path),
+        filename="bench.png",
+        headers=Headers({"content-type": "image/png"}),
+    )
+
+
+async def run(uploads: int, image_path: str) -> dict:
+    # Warm the worker pool so its start-up is not counted as upload memory
+    await s3_service._process(os.getpid)
+    files = [_upload_file(image_path) for _ in range(uploads)]
+    baseline_self = _rss_bytes(os.getpid())
+    baseline_children = sum(_rss_bytes(child) for child in _child_pids(os.getpid()))
+
+    sampler = RSSSampler()
+    sampler.start()
+    started = time.monotonic()
+    try:
+        results = await asyncio.gather(*(s3_service.upload_product_image(file) for file in files), return_exceptions=True)
+    finally:
+        seconds = time.monotonic() - started
+        sampler.stop()
+        for file in files:
+            file.file.close()
+
+    failed = [str(getattr(result, "detail", result)) for result in results if isinstance(result, BaseException)]
+    mb = 1024 * 1024
+    return {
+        "uploads": uploads,
+        "failed": len(failed),
+        "errors": failed[:5],
+        "seconds": round(seconds, 2),
+        "api_baseline_mb": round(baseline_self / mb, 1),
+        "api_peak_mb": round(sampler.peak_self / mb, 1),
+        "api_growth_per_upload_mb": round((sampler.peak_self - baseline_self) / uploads / mb, 2),
+        "workers": settings.IMAGE_PROCESS_WORKERS,
+        "workers_baseline_mb": round(baseline_children / mb, 1),
+        "workers_peak_mb": round(sampler.peak_children / mb, 1),
+    }
+
+
+def check(report: dict, max_api_growth_mb: Optional[float], max_workers_mb: Optional[float]) -> List[str]:
+    """Limits the report breaks, as messages"""
+    problems = []
+    if report["failed"]:
+        problems.append(f"{report['failed']} uploads failed")
+    if max_api_growth_mb is not None and report["api_growth_per_upload_mb"] > max_api_growth_mb:
+        problems.append(f"API growth {report['api_growth_per_upload_mb']}MB per upload > {max_api_growth_mb}MB")
+    if max_workers_mb is not None and report["workers_peak_mb"] > max_workers_mb:
+        problems.append(f"worker peak {report['workers_peak_mb']}MB > {max_workers_mb}MB")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_upload_rss", description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=20, help="uploads started at once")
+    parser.add_argument("--size-mb", type=float, default=10, help="image size (capped just under the upload limit)")
+    parser.add_argument("--no-s3", action="store_true", help="discard uploads instead of sending them to the bucket")
+    parser.add_argument("--max-api-growth-mb", type=float, help="fail if this process grows more per upload")
+    parser.add_argument("--max-workers-mb", type=float, help="fail if the workers' total peak RSS is higher")
+    args = parser.parse_args(argv)
+
+    if args.no_s3:
+        s3_service.s3_client = _DiscardingS3Client()
+
+    work_dir = tempfile.mkdtemp(prefix="bench-upload-")
+    try:
+        size = min(int(args.size_mb * 1024 * 1024), settings.IMAGE_MAX_UPLOAD_BYTES - 64 * 1024)
+        image_path = os.path.join(work_dir, "bench.png")
+        image_bytes = make_image(image_path, size)
+        report = asyncio.run(run(args.uploads, image_path))
+        report["image_mb"] = round(image_bytes / (1024 * 1024), 2)
+        print(json.dumps(report, indent=2))
+    finally:
+        s3_service.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.max_api_growth_mb is not None or args.max_workers_mb is not None:
+        problems = check(report, args.max_api_growth_mb, args.max_workers_mb)
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 from datetime import datetime, timezone, timedelta
 from fastapi import HTTPException, status, Request
-from sqlalchemy.orm import Session
-from models.users import User
-from models.users import OTP
+from sqlalchemy import select, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.users import User, generate_uuid
 from models.refresh_token import RefreshToken
-from core.security import create_access_token, create_refresh_token, verify_token
-from utils.otp_sender import send_otp_email
+from core.auth import user_cache
+from core.security import create_access_token, create_refresh_token, verify_token, token_digest
+from services.otp_delivery import otp_delivery, OTPDeliveryJob
+from services.otp_store import otp_store
 from sqlalchemy.exc import SQLAlchemyError
 from core.exceptions import (
     OTPAlreadySentException,
@@ -17,150 +19,140 @@ import uuid
 from core.config import settings
 
 
-def request_otp(db, identifier: str):
+# Find-or-create the user in one statement (ON CONFLICT on the identifier's
+# unique column). With DO NOTHING the existing row is read from the statement
+# snapshot, so the only case that returns no row is a concurrent first
+# request for the same new identifier; the caller retries that once.
+_UPSERT_USER_SQL = """
+    WITH inserted AS (
+        INSERT INTO users (id, email, phone_number, is_verified, is_active)
+        VALUES (:user_id, :email, :phone_number, false, true)
+        ON CONFLICT ({column}) DO NOTHING
+        RETURNING id, email, phone_number, true AS created
+    )
+    SELECT id, email, phone_number, created FROM inserted
+    UNION ALL
+    SELECT id, email, phone_number, false FROM users WHERE {column} = :identifier
+"""
+
+UPSERT_USER_SQL = {
+    column: text(_UPSERT_USER_SQL.format(column=column))
+    for column in ("email", "phone_number")
+}
+
+
+async def request_otp(db: AsyncSession, identifier: str):
     """
     Generates or reuses OTP for existing/new user.
     Prevents multiple active OTPs from being generated too frequently.
     """
     try:
-        user = db.query(User).filter(
-            (User.email == identifier) | (User.phone_number == identifier)
-        ).first()
-
-        new_user_created = False
-        if not user:
-            user = User(
-                email=identifier if "@" in identifier else None,
-                phone_number=None if "@" in identifier else identifier,
-            )
-            try:
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-                new_user_created = True
-            except SQLAlchemyError:
-                db.rollback()
-                raise DatabaseOperationException()
-
-        existing_otp = (
-            db.query(OTP)
-            .filter(
-                OTP.user_id == user.id,
-                OTP.is_used == False,
-                OTP.expires_at > datetime.utcnow(),
-            )
-            .order_by(OTP.created_at.desc())
-            .first()
-        )
-
-        if existing_otp:
-            time_remaining = (existing_otp.expires_at - datetime.now(timezone.utc)).seconds
-            raise OTPAlreadySentException(wait_seconds=time_remaining)
-
+        is_email = "@" in identifier
         otp_code = str(uuid.uuid4().int)[:6]
-        otp = OTP(
-            user_id=user.id,
-            otp_code=otp_code,
-            for_field="email" if user.email else "phone",
-            expires_at=OTP.create_expiry(5),
-        )
+        params = {
+            "user_id": generate_uuid(),
+            "email": identifier if is_email else None,
+            "phone_number": None if is_email else identifier,
+            "identifier": identifier,
+        }
+        stmt = UPSERT_USER_SQL["email" if is_email else "phone_number"]
 
         try:
-            db.add(otp)
-            db.commit()
+            user = (await db.execute(stmt, params)).one_or_none()
+            if user is None:
+                await db.commit()
+                user = (await db.execute(stmt, params)).one_or_none()
+            if user is None:
+                raise DatabaseOperationException()
+
+            for_field = "email" if user.email else "phone"
+            issued = await otp_store.issue(db, user.id, for_field, otp_code)
+            await db.commit()
         except SQLAlchemyError:
-            db.rollback()
+            await db.rollback()
             raise DatabaseOperationException()
 
-        try:
-            if user.email:
-                send_otp_email(user.email, otp_code)
-            elif user.phone_number:
-                send_otp_sms(user.phone_number, otp_code)
-        except Exception as e:
-            db.rollback()
-            raise OTPDeliveryFailedException(reason=str(e))
-
-        msg = "Account created. OTP sent." if new_user_created else "Login OTP sent."
+        if issued.otp_id is None:
+            raise OTPAlreadySentException(wait_seconds=issued.wait_seconds)
+
+        # Delivery happens in the background worker; the response does not wait for it
+        queued = otp_delivery.enqueue(OTPDeliveryJob(
+            otp_id=issued.otp_id,
+            channel=for_field,
+            destination=user.email or user.phone_number,
+            otp_code=otp_code,
+        ))
+        if not queued:
+            # Drop the undeliverable OTP so it does not block a retry
+            await otp_store.discard(db, user.id, issued.otp_id, otp_code)
+            await db.commit()
+            raise OTPDeliveryFailedException(reason="delivery queue is unavailable")
+
+        msg = "Account created. OTP sent." if user.created else "Login OTP sent."
         return {"message": msg}
 
     except (OTPAlreadySentException, OTPDeliveryFailedException, DatabaseOperationException):
         raise
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
 
 
+def issue_refresh_token(user_id: str):
+    """
+    Create a refresh token and its RefreshToken row (not yet added to the session).
+    The jti makes every token unique, even two issued in the same second.
+    """
+    jti = uuid.uuid4().hex
+    token = create_refresh_token({"sub": user_id, "jti": jti})
+    row = RefreshToken(
+        user_id=user_id,
+        token_hash=token_digest(token),
+        jti=jti,
+        expires_at=RefreshToken.expiry(),
+        is_revoked=False,
+    )
+    return token, row
+
+
 # ----------------------------------------
 # OTP VERIFICATION (already implemented)
 # ----------------------------------------
-def verify_otp_and_issue_tokens(db: Session, identifier: str, otp_code: str):
+async def verify_otp_and_issue_tokens(db: AsyncSession, identifier: str, otp_code: str):
     """
     Verify OTP and issue access and refresh tokens.
-    Reuses an existing refresh token if it exists and is still valid.
+    Only token digests are stored, so every login gets a new refresh token.
     """
     try:
         # --- find user ---
-        user = db.query(User).filter(
-            (User.email == identifier) | (User.phone_number == identifier)
-        ).first()
+        user = await db.scalar(
+            select(User).where(or_(User.email == identifier, User.phone_number == identifier))
+        )
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         # --- verify OTP ---
-        otp = (
-            db.query(OTP)
-            .filter(
-                OTP.user_id == user.id,
-                OTP.otp_code == otp_code,
-                OTP.is_used == False,
-                OTP.expires_at > datetime.utcnow(),
-            )
-            .order_by(OTP.created_at.desc())
-            .first()
-        )
-        if not otp:
+        if not await otp_store.consume(db, user.id, otp_code):
             raise InvalidOTPException()
 
         print(f"OTP verified for user -2: {user.id}")
 
-        otp.is_used = True
         user.is_verified = True
 
-        # --- check for existing valid refresh token ---
-        existing_refresh = (
-            db.query(RefreshToken)
-            .filter(
-                RefreshToken.user_id == user.id,
-                RefreshToken.is_revoked == False,
-                RefreshToken.expires_at > datetime.utcnow(),
-            )
-            .order_by(RefreshToken.expires_at.desc())
-            .first()
-        )
-        print(f"Existing refresh token: {existing_refresh}")
-
-        if existing_refresh:
-            refresh_token_str = existing_refresh.token
-        else:
-            refresh_token_str = create_refresh_token({"sub": user.id})
-            new_refresh = RefreshToken(
-                user_id=user.id,
-                token=refresh_token_str,
-                expires_at=RefreshToken.expiry(),
-                is_revoked=False,
-            )
-            db.add(new_refresh)
+        # --- issue refresh token ---
+        refresh_token_str, new_refresh = issue_refresh_token(user.id)
+        db.add(new_refresh)
 
         # --- generate access token ---
         access_token = create_access_token({"sub": user.id})
 
         # --- commit changes ---
         try:
-            db.add_all([otp, user])  # refresh token already added if new
-            db.commit()
+            db.add(user)  # refresh token already added
+            await db.commit()
         except Exception:
-            db.rollback()
+            await db.rollback()
             raise DatabaseOperationException()
+        user_cache.invalidate(user.id)  # is_verified changed
 
         return access_token, refresh_token_str, user
 
@@ -174,14 +166,14 @@ def verify_otp_and_issue_tokens(db: Session, identifier: str, otp_code: str):
         raise
     except Exception:
         # rollback and bubble up unexpected errors to global handler
-        db.rollback()
+        await db.rollback()
         raise
 
 
 # ----------------------------------------
 # REFRESH TOKEN HANDLER
 # ----------------------------------------
-def refresh_tokens(request: Request, db: Session):
+async def refresh_tokens(request: Request, db: AsyncSession):
     refresh_token_cookie = request.cookies.get("refresh_token")
     if not refresh_token_cookie:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing refresh token")
@@ -190,17 +182,19 @@ def refresh_tokens(request: Request, db: Session):
     payload = verify_token(refresh_token_cookie, secret_key=settings.REFRESH_SECRET_KEY)
     user_id = payload.get("sub")
 
-    # Validate refresh token in DB
-    token_in_db = db.query(RefreshToken).filter(
-        RefreshToken.token == refresh_token_cookie,
-        RefreshToken.is_revoked == False,
-        RefreshToken.expires_at > datetime.utcnow(),
-    ).first()
+    # Validate refresh token in DB (unique index on the digest)
+    token_in_db = await db.scalar(
+        select(RefreshToken).where(
+            RefreshToken.token_hash == token_digest(refresh_token_cookie),
+            RefreshToken.is_revoked == False,
+            RefreshToken.expires_at > datetime.utcnow(),
+        )
+    )
     if not token_in_db:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
 
     # Validate user
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -209,18 +203,13 @@ def refresh_tokens(request: Request, db: Session):
 
     # Revoke old refresh token and create a new one
     token_in_db.is_revoked = True
-    new_refresh = create_refresh_token({"sub": user.id})
-    new_token = RefreshToken(
-        user_id=user.id,
-        token=new_refresh,
-        expires_at=RefreshToken.expiry(),
-    )
+    new_refresh, new_token = issue_refresh_token(user.id)
 
     try:
         db.add_all([token_in_db, new_token])
-        db.commit()
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise DatabaseOperationException()
 
     return new_access, new_refresh, user
@@ -0,0 +1,192 @@
+"""
+Garbage collector for product images no product references any more,
+e.g. uploads of a create request that then failed.
+
+The bucket prefix is listed page by page and every key is checked against
+a snapshot of the image URLs (originals and variants) referenced by
+products. Unreferenced objects older than the grace period are deleted in
+batched delete_objects calls; younger ones may belong to a request still
+in flight and are left alone. Run it from cron:
+
+    python -m services.image_gc --dry-run
+    python -m services.image_gc --grace-hours 48
+"""
+import argparse
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Set
+
+from sqlalchemy import text
+
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+from services.product_service import IMAGE_REFERENCES_SQL
+from services.s3_service import MAX_DELETE_BATCH_SIZE, delete_keys, s3_service
+
+logger = logging.getLogger(__name__)
+
+# Orphans listed in the report (dry runs especially)
+REPORT_SAMPLE_SIZE = 20
+
+
+@dataclass
+class OrphanReport:
+    scanned: int = 0
+    scanned_bytes: int = 0
+    referenced: int = 0
+    in_grace: int = 0  # unreferenced but younger than the grace period
+    orphaned: int = 0
+    orphaned_bytes: int = 0
+    deleted: int = 0
+    failed: int = 0
+    dry_run: bool = False
+    aborted: Optional[str] = None
+    list_seconds: float = 0.0
+    delete_seconds: float = 0.0
+    objects_per_second: float = 0.0
+    sample: List[str] = field(default_factory=list)
+
+
+def load_referenced_keys(session, key_for_url: Callable[[str], Optional[str]], batch_size: int = 10000) -> Set[str]:
+    """Keys of every image URL referenced by a product, read through a server-side cursor."""
+    keys: Set[str] = set()
+    result = session.execute(
+        text(f"SELECT refs.url FROM products CROSS JOIN LATERAL ({IMAGE_REFERENCES_SQL}) AS refs"),
+        execution_options={"yield_per": batch_size},
+    )
+    for url in result.scalars():
+        key = key_for_url(url) if url else None
+        if key:
+            keys.add(key)
+    return keys
+
+
+class OrphanImageCollector:
+    """
+    Works on any boto3 S3 client (moto included), so it can be exercised
+    without the real bucket. Deletion only starts once the whole prefix has
+    been listed, and is refused when the orphans exceed max_delete_fraction
+    of the objects scanned: an empty or wrong reference snapshot must not
+    wipe the bucket.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        prefix: str,
+        grace_seconds: float,
+        page_size: int = 1000,
+        delete_batch_size: int = MAX_DELETE_BATCH_SIZE,
+        max_delete_fraction: float = 0.5,
+        dry_run: bool = False,
+    ):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.grace_seconds = grace_seconds
+        self.page_size = page_size
+        self.delete_batch_size = delete_batch_size
+        self.max_delete_fraction = max_delete_fraction
+        self.dry_run = dry_run
+
+    def find_orphans(self, referenced_keys: Set[str], report: OrphanReport) -> List[str]:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_seconds)
+        started = time.monotonic()
+        orphans: List[str] = []
+
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self.prefix, PaginationConfig={"PageSize": self.page_size})
+        for page in pages:
+            for obj in page.get("Contents", []):
+                report.scanned += 1
+                report.scanned_bytes += obj.get("Size", 0)
+                if obj["Key"] in referenced_keys:
+                    report.referenced += 1
+                elif obj["LastModified"] > cutoff:
+                    report.in_grace += 1
+                else:
+                    orphans.append(obj["Key"])
+                    report.orphaned_bytes += obj.get("Size", 0)
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Image GC: listed {report.scanned} objects, {len(orphans)} orphaned "
+                f"({report.scanned / elapsed if elapsed else 0:.0f} objects/s)"
+            )
+
+        report.orphaned = len(orphans)
+        report.list_seconds = round(time.monotonic() - started, 3)
+        report.sample = orphans[:REPORT_SAMPLE_SIZE]
+        return orphans
+
+    def run(self, referenced_keys: Set[str]) -> OrphanReport:
+        report = OrphanReport(dry_run=self.dry_run)
+        orphans = self.find_orphans(referenced_keys, report)
+
+        if orphans and not self.dry_run:
+            if report.orphaned > report.scanned * self.max_delete_fraction:
+                report.aborted = (
+                    f"{report.orphaned} of {report.scanned} objects would be deleted, "
+                    f"above max_delete_fraction={self.max_delete_fraction}"
+                )
+                logger.error(f"Image GC aborted: {report.aborted}")
+            else:
+                started = time.monotonic()
+                report.deleted, failed = delete_keys(self.s3_client, self.bucket, orphans, self.delete_batch_size)
+                report.failed = len(failed)
+                report.delete_seconds = round(time.monotonic() - started, 3)
+
+        total = report.list_seconds + report.delete_seconds
+        report.objects_per_second = round(report.scanned / total, 1) if total else 0.0
+        metrics.inc("image_gc.scanned", report.scanned)
+        metrics.inc("image_gc.deleted", report.deleted)
+        metrics.set_gauge("image_gc.last_run_orphaned", report.orphaned)
+        metrics.observe("image_gc.run_seconds", total)
+        action = "would delete" if self.dry_run else "deleted"
+        logger.info(
+            f"Image GC scanned {report.scanned} objects: {report.referenced} referenced, "
+            f"{report.in_grace} in grace, {report.orphaned} orphaned "
+            f"({report.orphaned_bytes / (1024 * 1024):.1f} MB); {action} "
+            f"{report.orphaned if self.dry_run else report.deleted} in {total:.1f}s"
+        )
+        return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m services.image_gc", description="Delete unreferenced product images")
+    parser.add_argument("--prefix", default=settings.IMAGE_GC_PREFIX)
+    parser.add_argument("--grace-hours", type=float, default=settings.IMAGE_GC_GRACE_SECONDS / 3600,
+                        help="only delete objects older than this")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    parser.add_argument("--max-delete-fraction", type=float, default=settings.IMAGE_GC_MAX_DELETE_FRACTION,
+                        help="refuse to delete more than this share of the objects scanned")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    session = db.get_session()
+    try:
+        referenced = load_referenced_keys(session, s3_service.key_for_url)
+    finally:
+        session.close()
+    logger.info(f"Image GC: {len(referenced)} image keys referenced by products")
+
+    collector = OrphanImageCollector(
+        s3_service.s3_client,
+        s3_service.bucket_name,
+        prefix=args.prefix,
+        grace_seconds=args.grace_hours * 3600,
+        delete_batch_size=settings.S3_DELETE_BATCH_SIZE,
+        max_delete_fraction=args.max_delete_fraction,
+        dry_run=args.dry_run,
+    )
+    report = collector.run(referenced)
+    print(json.dumps(asdict(report), indent=2))
+    raise SystemExit(1 if report.aborted or report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import text
+
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeTarget:
+    table: str
+    condition: str  # rows to reclaim; may use :grace_seconds
+    grace_seconds: int
+    archive_columns: str  # copied into {table}_archive; secrets are left out
+    archive_ddl: str  # column definitions of the archive table
+
+
+PURGE_TARGETS = [
+    PurgeTarget(
+        table="otps",
+        # Used OTPs expire too, so expiry alone covers used and unused ones
+        condition="expires_at < now() - make_interval(secs => CAST(:grace_seconds AS INTEGER))",
+        grace_seconds=settings.JANITOR_OTP_GRACE_SECONDS,
+        archive_columns=(
+            "id, user_id, for_field, is_used, delivery_status, delivery_attempts, "
+            "expires_at, created_at, delivered_at"
+        ),
+        archive_ddl="""
+            id INTEGER NOT NULL,
+            user_id VARCHAR NOT NULL,
+            for_field VARCHAR NOT NULL,
+            is_used BOOLEAN,
+            delivery_status VARCHAR,
+            delivery_attempts INTEGER,
+            expires_at TIMESTAMPTZ NOT NULL,
+            created_at TIMESTAMPTZ,
+            delivered_at TIMESTAMPTZ,
+            archived_at TIMESTAMPTZ NOT NULL
+        """,
+    ),
+    PurgeTarget(
+        table="refresh_tokens",
+        condition=(
+            "expires_at < now() - make_interval(secs => CAST(:grace_seconds AS INTEGER)) "
+            "OR (is_revoked AND created_at < now() - make_interval(secs => CAST(:grace_seconds AS INTEGER)))"
+        ),
+        grace_seconds=settings.JANITOR_REFRESH_TOKEN_GRACE_SECONDS,
+        archive_columns="id, user_id, jti, is_revoked, user_agent, ip_address, expires_at, created_at",
+        archive_ddl="""
+            id INTEGER NOT NULL,
+            user_id VARCHAR NOT NULL,
+            jti VARCHAR(32),
+            is_revoked BOOLEAN,
+            user_agent VARCHAR,
+            ip_address VARCHAR,
+            expires_at TIMESTAMPTZ NOT NULL,
+            created_at TIMESTAMPTZ,
+            archived_at TIMESTAMPTZ NOT NULL
+        """,
+    ),
+]
+
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+class Janitor:
+    """
+    Reclaims expired OTPs and expired or revoked refresh tokens.
+
+    Rows are removed in small batches, each its own short transaction:
+    the batch is picked with FOR UPDATE SKIP LOCKED, so the janitor never
+    waits on rows a request is using (and several workers can run it at
+    once), and lock_timeout bounds how long any statement may queue for a
+    lock. A run stops after max_batches; whatever is left goes next run.
+
+    With archive enabled, rows are moved into monthly range partitions of
+    {table}_archive (partitioned on archived_at) instead of being dropped.
+    OTP codes and token strings are not archived.
+    """
+
+    def __init__(self, interval: float, batch_size: int, batch_pause: float,
+                 max_batches: int, lock_timeout_ms: int, archive: bool):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.lock_timeout_ms = lock_timeout_ms
+        self.archive = archive
+        self._partitions: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _purge_sql(self, target: PurgeTarget):
+        doomed = (
+            f"WITH doomed AS ("
+            f" SELECT id FROM {target.table} WHERE {target.condition}"
+            f" LIMIT :batch_size FOR UPDATE SKIP LOCKED"
+            f")"
+        )
+        if not self.archive:
+            return text(f"{doomed} DELETE FROM {target.table} t USING doomed WHERE t.id = doomed.id")
+        columns = target.archive_columns
+        moved = ", ".join(f"t.{column.strip()}" for column in columns.split(","))
+        return text(
+            f"{doomed}, moved AS ("
+            f" DELETE FROM {target.table} t USING doomed WHERE t.id = doomed.id RETURNING {moved}"
+            f")"
+            f" INSERT INTO {target.table}_archive ({columns}, archived_at)"
+            f" SELECT {columns}, now() FROM moved"
+        )
+
+    async def _ensure_archive(self, target: PurgeTarget):
+        """Create the archive table and the partitions for this month and next."""
+        now = datetime.now(timezone.utc)
+        bounds = {}
+        for offset in (0, 1):
+            start = _month_start(now.year, now.month + offset)
+            end = _month_start(now.year, now.month + offset + 1)
+            bounds[f"{target.table}_archive_y{start.year}m{start.month:02d}"] = (start, end)
+        if set(bounds) <= self._partitions:
+            return
+
+        async with db.get_async_session() as session:
+            await session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {target.table}_archive ({target.archive_ddl}) "
+                f"PARTITION BY RANGE (archived_at)"
+            ))
+            for name, (start, end) in bounds.items():
+                await session.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {target.table}_archive "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+            await session.commit()
+        self._partitions |= set(bounds)
+
+    async def _purge_batch(self, stmt, target: PurgeTarget) -> int:
+        async with db.get_async_session() as session:
+            await session.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+            result = await session.execute(stmt, {
+                "batch_size": self.batch_size,
+                "grace_seconds": target.grace_seconds,
+            })
+            await session.commit()
+            return result.rowcount
+
+    async def purge(self, target: PurgeTarget) -> int:
+        """Reclaim up to max_batches batches from target.table. Returns rows reclaimed."""
+        if self.archive:
+            await self._ensure_archive(target)
+        stmt = self._purge_sql(target)
+
+        reclaimed = 0
+        for _ in range(self.max_batches):
+            count = await self._purge_batch(stmt, target)
+            reclaimed += count
+            if count < self.batch_size:
+                break
+            # Let other writers through between batches
+            await asyncio.sleep(self.batch_pause)
+        return reclaimed
+
+    async def run_once(self) -> Dict[str, int]:
+        """One pass over every target; returns rows reclaimed per table."""
+        started = time.monotonic()
+        reclaimed: Dict[str, int] = {}
+        for target in PURGE_TARGETS:
+            table_started = time.monotonic()
+            try:
+                reclaimed[target.table] = await self.purge(target)
+            except Exception as e:
+                metrics.inc("janitor.errors")
+                logger.error(f"Janitor failed on {target.table}: {str(e)}")
+                continue
+            metrics.inc(f"janitor.{target.table}.reclaimed", reclaimed[target.table])
+            metrics.observe(f"janitor.{target.table}.seconds", time.monotonic() - table_started)
+
+        duration = time.monotonic() - started
+        metrics.observe("janitor.run_seconds", duration)
+        metrics.set_gauge("janitor.last_run_reclaimed", sum(reclaimed.values()))
+        action = "archived" if self.archive else "deleted"
+        logger.info(f"Janitor {action} {reclaimed} rows in {duration:.2f}s")
+        return reclaimed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self):
+        """Start the periodic janitor on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+janitor = Janitor(
+    interval=settings.JANITOR_INTERVAL_SECONDS,
+    batch_size=settings.JANITOR_BATCH_SIZE,
+    batch_pause=settings.JANITOR_BATCH_PAUSE_SECONDS,
+    max_batches=settings.JANITOR_MAX_BATCHES_PER_RUN,
+    lock_timeout_ms=settings.JANITOR_LOCK_TIMEOUT_MS,
+    archive=settings.JANITOR_ARCHIVE,
+)
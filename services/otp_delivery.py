@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from core.config import settings
+from core.metrics import metrics
+from services.otp_store import DeliveryUpdate, OTPId, otp_store
+from utils.otp_channels import OTPChannel, OTPMessage, build_otp_channels
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OTPDeliveryJob:
+    otp_id: OTPId
+    channel: str  # 'email' or 'phone'
+    destination: str
+    otp_code: str
+    attempts: int = 0
+
+
+class OTPDeliveryWorker:
+    """
+    Queue-backed OTP delivery, so the HTTP request returns as soon as the
+    OTP is persisted. A fixed set of worker tasks drains the queue, each
+    taking up to batch_size jobs at a time and handing them to the channel
+    for their OTP.for_field ('email' / 'phone'), which applies the
+    provider's concurrency, rate limit and batching. Failures are retried
+    with exponential backoff. Outcomes are reported to the OTP store (for
+    the SQL store: delivery_status, delivery_attempts, delivery_error and
+    delivered_at on the OTP row).
+
+    The queue is in-process: jobs still queued when the process dies are
+    lost and stay 'queued'; the user can request a new OTP.
+    """
+
+    def __init__(self, channels: Dict[str, OTPChannel], workers: int, queue_size: int,
+                 batch_size: int, max_attempts: int, retry_base_delay: float):
+        self.channels = channels
+        self.workers = workers
+        self.batch_size = max(batch_size, 1)
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+
+    def enqueue(self, job: OTPDeliveryJob) -> bool:
+        """Queue a delivery. Returns False if the worker is not running or the queue is full."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.inc("otp_delivery.rejected")
+            return False
+        metrics.set_gauge("otp_delivery.queue_depth", self._queue.qsize())
+        return True
+
+    async def _record(self, updates: List[DeliveryUpdate]):
+        try:
+            await otp_store.record_delivery(updates)
+        except Exception as e:
+            logger.error(f"Failed to record delivery status for {len(updates)} OTPs: {str(e)}")
+
+    async def _retry_later(self, job: OTPDeliveryJob, delay: float):
+        await asyncio.sleep(delay)
+        if not self.enqueue(job):
+            await self._record([DeliveryUpdate(job.otp_id, "failed", job.attempts, "delivery queue unavailable for retry")])
+
+    def _handle_failure(self, job: OTPDeliveryJob, exc: Exception) -> DeliveryUpdate:
+        error = str(exc) or exc.__class__.__name__
+        if job.attempts < self.max_attempts:
+            delay = self.retry_base_delay * (2 ** (job.attempts - 1))
+            logger.warning(f"OTP {job.otp_id} delivery attempt {job.attempts} failed, retrying in {delay}s: {error}")
+            metrics.inc("otp_delivery.retries")
+            task = asyncio.create_task(self._retry_later(job, delay))
+            self._retries.add(task)
+            task.add_done_callback(self._retries.discard)
+            return DeliveryUpdate(job.otp_id, "retrying", job.attempts, error)
+
+        logger.error(f"OTP {job.otp_id} delivery failed after {job.attempts} attempts: {error}")
+        metrics.inc("otp_delivery.failed")
+        return DeliveryUpdate(job.otp_id, "failed", job.attempts, error)
+
+    async def _deliver_channel(self, channel_name: str, jobs: List[OTPDeliveryJob]):
+        channel = self.channels.get(channel_name)
+        if channel is None:
+            error = RuntimeError(f"No delivery channel configured for '{channel_name}'")
+            results: List[Optional[Exception]] = [error] * len(jobs)
+        else:
+            started = time.monotonic()
+            results = await channel.send([OTPMessage(job.destination, job.otp_code) for job in jobs])
+            metrics.observe(f"otp_delivery.{channel_name}.send_seconds", time.monotonic() - started)
+
+        updates = []
+        for job, error in zip(jobs, results):
+            if error is None:
+                metrics.inc("otp_delivery.sent")
+                updates.append(DeliveryUpdate(job.otp_id, "sent", job.attempts))
+            else:
+                updates.append(self._handle_failure(job, error))
+        # One status write for the whole batch
+        await self._record(updates)
+
+    async def _deliver(self, jobs: List[OTPDeliveryJob]):
+        by_channel: Dict[str, List[OTPDeliveryJob]] = defaultdict(list)
+        for job in jobs:
+            job.attempts += 1
+            by_channel[job.channel].append(job)
+        await asyncio.gather(*(
+            self._deliver_channel(channel_name, channel_jobs)
+            for channel_name, channel_jobs in by_channel.items()
+        ))
+
+    async def _run(self):
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._deliver(jobs)
+            except Exception as e:
+                logger.error(f"Unexpected error delivering {len(jobs)} OTPs: {str(e)}")
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+                metrics.set_gauge("otp_delivery.queue_depth", self._queue.qsize())
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Give queued deliveries up to `timeout` seconds to finish, then stop."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping OTP delivery with {self._queue.qsize()} jobs still queued")
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        for channel in self.channels.values():
+            await channel.close()
+
+
+otp_delivery = OTPDeliveryWorker(
+    channels=build_otp_channels(),
+    workers=settings.OTP_DELIVERY_WORKERS,
+    queue_size=settings.OTP_DELIVERY_QUEUE_SIZE,
+    batch_size=settings.OTP_DELIVERY_BATCH_SIZE,
+    max_attempts=settings.OTP_DELIVERY_MAX_ATTEMPTS,
+    retry_base_delay=settings.OTP_DELIVERY_RETRY_BASE_SECONDS,
+)
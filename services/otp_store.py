@@ -0,0 +1,328 @@
+import json
+import logging
+import math
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import case, delete, func, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from db.session import db as database
+from models.users import OTP
+
+logger = logging.getLogger(__name__)
+
+OTPId = Union[int, str]
+
+
+@dataclass
+class IssuedOTP:
+    otp_id: Optional[OTPId]  # None when an unexpired OTP already exists
+    wait_seconds: int = 0  # remaining lifetime of that existing OTP
+
+
+@dataclass
+class DeliveryUpdate:
+    otp_id: OTPId
+    status: str  # 'retrying', 'sent' or 'failed'
+    attempts: int
+    error: Optional[str] = None
+
+
+class OTPStore:
+    """
+    Where issued OTPs live between request_otp and verify.
+
+    `db` is the request's session. The SQL store writes through it and
+    leaves the commit to the caller, so the OTP commits together with the
+    user row or the token changes. Key-value stores ignore it.
+    """
+
+    async def issue(self, db: AsyncSession, user_id: str, for_field: str, otp_code: str) -> IssuedOTP:
+        """Store a new OTP for user_id unless an unexpired one exists."""
+        raise NotImplementedError
+
+    async def consume(self, db: AsyncSession, user_id: str, otp_code: str) -> bool:
+        """Atomically use up user_id's OTP if otp_code matches an unexpired one."""
+        raise NotImplementedError
+
+    async def discard(self, db: AsyncSession, user_id: str, otp_id: OTPId, otp_code: str):
+        """Remove an OTP that could not be delivered so it does not block a retry."""
+        raise NotImplementedError
+
+    async def record_delivery(self, updates: List[DeliveryUpdate]):
+        """
+        Record delivery outcomes reported by the delivery worker. An OTP
+        whose delivery finally failed no longer counts as active, so the
+        user can request a new one straight away.
+        """
+        raise NotImplementedError
+
+
+class SQLOTPStore(OTPStore):
+    """OTP rows in the otps table; lookups go through ix_otps_user_active."""
+
+    ISSUE_SQL = text(
+        """
+        WITH active AS (
+            SELECT expires_at
+            FROM otps
+            WHERE user_id = :user_id AND is_used = false AND expires_at > now()
+              -- a code that could not be delivered must not block a new one
+              AND delivery_status IS DISTINCT FROM 'failed'
+            ORDER BY created_at DESC
+            LIMIT 1
+        ),
+        new_otp AS (
+            INSERT INTO otps (user_id, otp_code, for_field, is_used, expires_at, delivery_status, delivery_attempts)
+            SELECT :user_id, :otp_code, :for_field, false,
+                   now() + make_interval(secs => CAST(:ttl_seconds AS INTEGER)), 'queued', 0
+            WHERE NOT EXISTS (SELECT 1 FROM active)
+            RETURNING id
+        )
+        SELECT (SELECT id FROM new_otp) AS otp_id,
+               (SELECT expires_at FROM active) AS active_expires_at
+        """
+    )
+
+    CONSUME_SQL = text(
+        """
+        UPDATE otps SET is_used = true
+        WHERE id = (
+            SELECT id
+            FROM otps
+            WHERE user_id = :user_id AND otp_code = :otp_code
+              AND is_used = false AND expires_at > now()
+            ORDER BY created_at DESC
+            LIMIT 1
+        )
+        RETURNING id
+        """
+    )
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def issue(self, db: AsyncSession, user_id: str, for_field: str, otp_code: str) -> IssuedOTP:
+        row = (await db.execute(self.ISSUE_SQL, {
+            "user_id": user_id,
+            "otp_code": otp_code,
+            "for_field": for_field,
+            "ttl_seconds": self.ttl_seconds,
+        })).one()
+        if row.active_expires_at is not None:
+            return IssuedOTP(None, (row.active_expires_at - datetime.now(timezone.utc)).seconds)
+        return IssuedOTP(row.otp_id)
+
+    async def consume(self, db: AsyncSession, user_id: str, otp_code: str) -> bool:
+        result = await db.execute(self.CONSUME_SQL, {"user_id": user_id, "otp_code": otp_code})
+        return result.scalar() is not None
+
+    async def discard(self, db: AsyncSession, user_id: str, otp_id: OTPId, otp_code: str):
+        await db.execute(delete(OTP).where(OTP.id == otp_id))
+
+    async def record_delivery(self, updates: List[DeliveryUpdate]):
+        # One UPDATE for the whole batch, with per-row values picked by CASE
+        statuses = {u.otp_id: u.status for u in updates}
+        status_expr = case(statuses, value=OTP.id)
+        stmt = (
+            update(OTP)
+            .where(OTP.id.in_(list(statuses)))
+            .values(
+                delivery_status=status_expr,
+                delivery_attempts=case({u.otp_id: u.attempts for u in updates}, value=OTP.id),
+                delivery_error=case({u.otp_id: u.error for u in updates}, value=OTP.id),
+                delivered_at=case((status_expr == "sent", func.now()), else_=OTP.delivered_at),
+            )
+        )
+        async with database.get_async_session() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+class TTLStore:
+    """String key/value store where every key expires."""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: float, nx: bool = False) -> bool:
+        """Set key; with nx only if it does not exist. Returns whether it was set."""
+        raise NotImplementedError
+
+    async def ttl(self, key: str) -> Optional[float]:
+        """Seconds until key expires, or None if it does not exist."""
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> int:
+        """Delete keys, returning how many existed."""
+        raise NotImplementedError
+
+
+class MemoryTTLStore(TTLStore):
+    """
+    In-process TTL store. Expiry is tracked on a timing wheel of
+    `resolution`-second slots: each write files its key under the slot it
+    expires in, and every operation first sweeps the slots that have passed,
+    so expired keys are freed without scanning the whole dict. Reads also
+    check the deadline, so a key is never served late.
+
+    Per process only: with several workers, use the Redis store.
+    """
+
+    def __init__(self, resolution: float = 1.0):
+        self.resolution = resolution
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._wheel: Dict[int, Set[str]] = {}
+        self._cursor = math.floor(time.monotonic() / resolution)
+
+    def _sweep(self):
+        # Slot s holds deadlines in ((s - 1) * resolution, s * resolution], so
+        # every key in a slot up to floor(now / resolution) has expired
+        now = time.monotonic()
+        current = math.floor(now / self.resolution)
+        if current - self._cursor > len(self._wheel):
+            slots = [slot for slot in self._wheel if slot <= current]
+        else:
+            slots = range(self._cursor, current + 1)
+        for slot in slots:
+            for key in self._wheel.pop(slot, ()):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+        self._cursor = current + 1
+
+    def _live(self, key: str) -> Optional[Tuple[str, float]]:
+        self._sweep()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: str, ttl: float, nx: bool = False) -> bool:
+        if nx and self._live(key) is not None:
+            return False
+        deadline = time.monotonic() + ttl
+        self._entries[key] = (value, deadline)
+        self._wheel.setdefault(math.ceil(deadline / self.resolution), set()).add(key)
+        return True
+
+    async def ttl(self, key: str) -> Optional[float]:
+        entry = self._live(key)
+        return entry[1] - time.monotonic() if entry else None
+
+    async def delete(self, *keys: str) -> int:
+        self._sweep()
+        # Keys stay filed on the wheel; the sweep skips ones already gone
+        return sum(self._entries.pop(key, None) is not None for key in keys)
+
+
+class RedisTTLStore(TTLStore):
+    """Redis (or any Redis-protocol server) TTL store; shared across workers."""
+
+    def __init__(self, url: str, prefix: str = "xsnapster:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("OTP_STORE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: float, nx: bool = False) -> bool:
+        return bool(await self.client.set(self.prefix + key, value, px=int(ttl * 1000), nx=nx))
+
+    async def ttl(self, key: str) -> Optional[float]:
+        remaining = await self.client.pttl(self.prefix + key)
+        return remaining / 1000 if remaining >= 0 else None
+
+    async def delete(self, *keys: str) -> int:
+        return await self.client.delete(*(self.prefix + key for key in keys))
+
+
+class KeyValueOTPStore(OTPStore):
+    """
+    OTPs as expiring keys; the store's TTL replaces expires_at and nothing
+    has to be cleaned up.
+
+    otp:{user}       -> otp id; SET NX, so at most one active OTP per user
+    otp:{user}:{code} -> otp id; verifying is a single DELETE of this key
+    otp:delivery:{id} -> delivery status JSON (with the user and code, so a
+                         failed delivery can release the OTP), for as long
+                         as the OTP lives
+    """
+
+    def __init__(self, store: TTLStore, ttl_seconds: int):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+
+    async def issue(self, db: AsyncSession, user_id: str, for_field: str, otp_code: str) -> IssuedOTP:
+        otp_id = uuid.uuid4().hex
+        if not await self.store.set(f"otp:{user_id}", otp_id, self.ttl_seconds, nx=True):
+            remaining = await self.store.ttl(f"otp:{user_id}")
+            return IssuedOTP(None, int(remaining or 0))
+        await self.store.set(f"otp:{user_id}:{otp_code}", otp_id, self.ttl_seconds)
+        record = {"status": "queued", "attempts": 0, "user_id": user_id, "otp_code": otp_code}
+        await self.store.set(f"otp:delivery:{otp_id}", json.dumps(record), self.ttl_seconds)
+        return IssuedOTP(otp_id)
+
+    async def _release(self, user_id: str, otp_id: OTPId):
+        # Free the user's slot, unless it already belongs to a newer OTP
+        if await self.store.get(f"otp:{user_id}") == otp_id:
+            await self.store.delete(f"otp:{user_id}")
+
+    async def consume(self, db: AsyncSession, user_id: str, otp_code: str) -> bool:
+        code_key = f"otp:{user_id}:{otp_code}"
+        otp_id = await self.store.get(code_key)
+        # The DELETE is the atomic step: of two concurrent verifies only one removes the key
+        if otp_id is None or not await self.store.delete(code_key):
+            return False
+        await self._release(user_id, otp_id)
+        return True
+
+    async def discard(self, db: AsyncSession, user_id: str, otp_id: OTPId, otp_code: str):
+        await self.store.delete(f"otp:{user_id}:{otp_code}", f"otp:delivery:{otp_id}")
+        await self._release(user_id, otp_id)
+
+    async def record_delivery(self, updates: List[DeliveryUpdate]):
+        for u in updates:
+            key = f"otp:delivery:{u.otp_id}"
+            stored = await self.store.get(key)
+            remaining = await self.store.ttl(key)
+            if stored is None or remaining is None:
+                continue
+            previous = json.loads(stored)
+            if u.status == "failed":
+                # The user never got this code; free the slot for a new request
+                await self.discard(None, previous["user_id"], u.otp_id, previous["otp_code"])
+                continue
+            record = {**previous, "status": u.status, "attempts": u.attempts, "error": u.error}
+            if u.status == "sent":
+                record["delivered_at"] = datetime.now(timezone.utc).isoformat()
+            await self.store.set(key, json.dumps(record), remaining)
+
+
+def _build_otp_store() -> OTPStore:
+    backend = settings.OTP_STORE_BACKEND.lower()
+    if backend == "sql":
+        return SQLOTPStore(settings.OTP_TTL_SECONDS)
+    if backend == "memory":
+        return KeyValueOTPStore(MemoryTTLStore(), settings.OTP_TTL_SECONDS)
+    if backend == "redis":
+        store = RedisTTLStore(settings.OTP_STORE_REDIS_URL or settings.CACHE_REDIS_URL)
+        return KeyValueOTPStore(store, settings.OTP_TTL_SECONDS)
+    raise RuntimeError(f"Unknown OTP_STORE_BACKEND '{settings.OTP_STORE_BACKEND}'")
+
+
+otp_store = _build_otp_store()
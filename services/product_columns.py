@@ -0,0 +1,44 @@
+"""
+Product columns shared by catalog export and bulk import, so a file
+exported by one can be imported by the other. Kept free of service
+imports: both sides load it without pulling in each other's dependencies.
+"""
+from sqlalchemy import func
+
+from models.products import Product, ProductAnalytics
+
+# Joins list values (image_links) in a single CSV cell
+CSV_LIST_SEPARATOR = "|"
+
+# Image URL columns read by import, in order of precedence; image_links is the export's name
+IMAGE_URL_FIELDS = ("image_urls", "image_links")
+
+EXPORT_COLUMNS = [
+    Product.id,
+    Product.slug,
+    Product.title,
+    Product.one_liner,
+    Product.description,
+    Product.price,
+    Product.discounted_price,
+    Product.category,
+    Product.subcategory,
+    Product.dimensions,
+    Product.image_links,
+    Product.image_variants,
+    Product.is_active,
+    Product.created_at,
+    Product.updated_at,
+    # Products without analytics export zeros, as in listings
+    func.coalesce(ProductAnalytics.view_count, 0).label("view_count"),
+    func.coalesce(ProductAnalytics.purchase_count, 0).label("purchase_count"),
+    func.coalesce(ProductAnalytics.rating, 0.0).label("rating"),
+    func.coalesce(ProductAnalytics.review_count, 0).label("review_count"),
+    func.coalesce(ProductAnalytics.stock_count, 0).label("stock_count"),
+    func.coalesce(ProductAnalytics.wishlist_count, 0).label("wishlist_count"),
+]
+
+# CSV is flat: image_links are CSV_LIST_SEPARATOR-joined and the nested
+# image_variants manifests are left out. Import reads image_links like
+# image_urls, so both formats can be imported back.
+CSV_FIELDS = [column.key for column in EXPORT_COLUMNS if column.key != "image_variants"]
@@ -0,0 +1,166 @@
+"""
+Streaming catalog export as NDJSON or CSV, for feeds.
+
+Rows come from one server-side cursor (yield_per) and are encoded as they
+arrive, in chunks of about PRODUCT_EXPORT_CHUNK_BYTES, so memory stays
+flat however large the catalog is. Plain columns are selected rather than
+ORM entities, so nothing accumulates in the session either.
+
+    python -m services.product_export --format csv -o catalog.csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+from models.products import Product, ProductAnalytics
+from services.product_columns import CSV_FIELDS, CSV_LIST_SEPARATOR, EXPORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _encode_ndjson(row: dict) -> str:
+    return json.dumps(row, default=_json_default, separators=(",", ":")) + "\n"
+
+
+class _CSVEncoder:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _take(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+    def header(self) -> str:
+        self._writer.writerow(CSV_FIELDS)
+        return self._take()
+
+    def encode(self, row: dict) -> str:
+        values = []
+        for name in CSV_FIELDS:
+            value = row[name]
+            if name == "image_links":
+                value = CSV_LIST_SEPARATOR.join(value or [])
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        self._writer.writerow(values)
+        return self._take()
+
+
+def export_query(category: Optional[str] = None, subcategory: Optional[str] = None, is_active: Optional[bool] = True):
+    query = select(*EXPORT_COLUMNS).outerjoin(ProductAnalytics, ProductAnalytics.product_id == Product.id)
+    if is_active is not None:
+        query = query.where(Product.is_active == is_active)
+    if category:
+        query = query.where(Product.category == category)
+    if subcategory:
+        query = query.where(Product.subcategory == subcategory)
+    return query.order_by(Product.id)
+
+
+async def stream_export(
+    fmt: str,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    is_active: Optional[bool] = True,
+    batch_size: int = settings.PRODUCT_EXPORT_BATCH_SIZE,
+    chunk_bytes: int = settings.PRODUCT_EXPORT_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """
+    Yield the export in encoded chunks. Opens its own session, since a
+    StreamingResponse keeps reading after the route has returned.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+
+    started = time.monotonic()
+    rows = 0
+    parts: List[str] = []
+    size = 0
+    csv_encoder = _CSVEncoder() if fmt == "csv" else None
+    if csv_encoder is not None:
+        parts.append(csv_encoder.header())
+
+    stmt = export_query(category, subcategory, is_active).execution_options(yield_per=batch_size)
+    async with db.get_async_session() as session:
+        result = await session.stream(stmt)
+        async for row in result.mappings():
+            part = csv_encoder.encode(row) if csv_encoder is not None else _encode_ndjson(dict(row))
+            parts.append(part)
+            size += len(part)
+            rows += 1
+            if size >= chunk_bytes:
+                yield "".join(parts).encode("utf-8")
+                parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+    duration = time.monotonic() - started
+    metrics.inc("product_export.rows", rows)
+    metrics.observe("product_export.seconds", duration)
+    logger.info(f"Exported {rows} products as {fmt} in {duration:.2f}s")
+
+
+# ----------------------------------------
+# CLI
+# ----------------------------------------
+async def _run_cli(args):
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in stream_export(
+            args.format,
+            category=args.category,
+            subcategory=args.subcategory,
+            is_active=None if args.include_inactive else True,
+            batch_size=args.batch_size,
+        ):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        await db.close_async()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m services.product_export", description="Export the product catalog")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--category")
+    parser.add_argument("--subcategory")
+    parser.add_argument("--include-inactive", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=settings.PRODUCT_EXPORT_BATCH_SIZE,
+                        help="rows fetched from the cursor at a time")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    main()
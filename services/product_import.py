@@ -0,0 +1,376 @@
+"""
+Bulk product import from CSV or JSONL.
+
+Rows are read incrementally and handled in chunks of chunk_size: each
+chunk is validated with ProductCreate, its images are fetched and
+processed concurrently, its slugs are allocated with one query, and its
+products go in with one multi-row INSERT and one commit. Rows that fail
+(validation, image fetch) are reported and skipped; the rest of their
+chunk is still imported.
+
+Columns (CSV) or keys (JSONL) are the ProductCreate fields plus
+image_urls: a list in JSONL, "|"-separated in CSV. image_links, as written
+by services.product_export, is read the same way, so an export can be
+imported back. Images are only fetched from IMAGE_FETCH_ALLOWED_HOSTS.
+
+    python -m services.product_import catalog.csv --report errors.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError
+
+from core.cache import response_cache
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+from models.products import Product, ProductAnalytics
+from schemas.products import ProductCreate, ProductImportError, ProductImportReport
+from services.product_columns import CSV_LIST_SEPARATOR, IMAGE_URL_FIELDS
+from services.product_service import SLUG_INSERT_ATTEMPTS, allocate_slugs, base_slug_for, is_slug_conflict, product_values
+from services.s3_service import s3_service
+from services.showcase_service import showcase
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "jsonl")
+# One multi-row INSERT per chunk; asyncpg allows 32767 bind parameters
+MAX_CHUNK_SIZE = 2000
+# Checked per row, so an over-long value fails its row instead of the INSERT
+COLUMN_MAX_LENGTHS = {
+    column.name: column.type.length
+    for column in Product.__table__.columns
+    if isinstance(column.type, String) and column.type.length and column.name in ProductCreate.model_fields
+}
+
+
+@dataclass
+class ImportRow:
+    line: int
+    product: ProductCreate
+    image_urls: List[str]
+    manifests: List[dict] = field(default_factory=list)
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return None
+
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """
+    Yield (line number, raw record) from a binary stream without reading it
+    all: a dict per CSV row, or the text of each non-blank JSONL line.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(text, 1):
+            if line.strip():
+                yield line_number, line
+
+
+def _first_present(record: dict, keys: Tuple[str, ...]):
+    return next((record[key] for key in keys if record.get(key) is not None), None)
+
+
+def parse_row(line: int, raw: Union[dict, str]) -> ImportRow:
+    """Validate one raw record; raises ValueError (incl. ValidationError)."""
+    if isinstance(raw, str):
+        record = json.loads(raw)
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+        image_urls = _first_present(record, IMAGE_URL_FIELDS) or []
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
+    else:
+        raw.pop(None, None)  # cells beyond the header
+        # Empty CSV cells mean "not set"
+        record = {key: value.strip() or None if isinstance(value, str) else value for key, value in raw.items()}
+        image_urls = (_first_present(record, IMAGE_URL_FIELDS) or "").split(CSV_LIST_SEPARATOR)
+
+    if not isinstance(image_urls, list) or not all(isinstance(url, str) for url in image_urls):
+        raise ValueError("image_urls must be a list of URLs")
+    product = ProductCreate.model_validate(record)
+    for name, max_length in COLUMN_MAX_LENGTHS.items():
+        value = getattr(product, name)
+        if value is not None and len(value) > max_length:
+            raise ValueError(f"{name}: at most {max_length} characters allowed, got {len(value)}")
+
+    return ImportRow(
+        line=line,
+        product=product,
+        image_urls=[url.strip() for url in image_urls if url and url.strip()],
+    )
+
+
+def read_chunk(records: Iterator[Tuple[int, Union[dict, str]]], size: int) -> Tuple[int, List[ImportRow], List[Tuple[int, ValueError]]]:
+    """
+    Read and validate records until size rows are valid or the input ends.
+    Returns (records read, valid rows, (line, error) of invalid ones).
+    Blocking (file reads, validation): run it off the event loop.
+    """
+    read = 0
+    rows: List[ImportRow] = []
+    errors: List[Tuple[int, ValueError]] = []
+    for line, raw in records:
+        read += 1
+        try:
+            rows.append(parse_row(line, raw))
+        except ValueError as e:
+            errors.append((line, e))
+        if len(rows) >= size:
+            break
+    return read, rows, errors
+
+
+def _error_message(error: BaseException) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        )
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    if isinstance(error, DBAPIError):
+        # The driver message, without the statement and its parameters
+        return str(error.orig).strip().splitlines()[0]
+    return str(error) or type(error).__name__
+
+
+class ProductImporter:
+    """
+    Imports one file. error_sink, if given, receives every row error as it
+    happens (the report itself keeps the first max_reported_errors).
+    With fetch_images off, image_urls are stored as given, without variants.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.PRODUCT_IMPORT_CHUNK_SIZE,
+        image_concurrency: int = settings.PRODUCT_IMPORT_IMAGE_CONCURRENCY,
+        max_reported_errors: int = settings.PRODUCT_IMPORT_MAX_REPORTED_ERRORS,
+        fetch_images: bool = True,
+        error_sink: Optional[Callable[[ProductImportError], None]] = None,
+    ):
+        self.chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        self.image_concurrency = image_concurrency
+        self.max_reported_errors = max_reported_errors
+        self.fetch_images = fetch_images
+        self.error_sink = error_sink
+        self.report = ProductImportReport()
+        self._started = 0.0
+
+    def _fail(self, line: int, error: Union[BaseException, str]):
+        row_error = ProductImportError(line=line, error=error if isinstance(error, str) else _error_message(error))
+        self.report.failed += 1
+        metrics.inc("product_import.rows_failed")
+        if len(self.report.errors) < self.max_reported_errors:
+            self.report.errors.append(row_error)
+        else:
+            self.report.errors_truncated = True
+        if self.error_sink is not None:
+            self.error_sink(row_error)
+
+    async def _fetch_images(self, rows: List[ImportRow]) -> List[ImportRow]:
+        """Fetch every image of the chunk concurrently; drop rows with a failed image."""
+        semaphore = asyncio.Semaphore(self.image_concurrency)
+
+        async def fetch(url: str) -> dict:
+            async with semaphore:
+                try:
+                    return await s3_service.import_product_image(url)
+                except HTTPException as e:
+                    raise HTTPException(status_code=e.status_code, detail=f"{url}: {e.detail}")
+
+        async def fetch_row(row: ImportRow):
+            row.manifests = list(await asyncio.gather(*(fetch(url) for url in row.image_urls)))
+
+        results = await asyncio.gather(*(fetch_row(row) for row in rows), return_exceptions=True)
+        fetched = []
+        for row, result in zip(rows, results):
+            if isinstance(result, BaseException):
+                # Images of this row that did upload are left unreferenced
+                self._fail(row.line, result)
+            else:
+                fetched.append(row)
+        return fetched
+
+    def _values(self, row: ImportRow, slug: str) -> dict:
+        if self.fetch_images:
+            image_links = [manifest["original"] for manifest in row.manifests]
+            return product_values(row.product, slug, image_links, row.manifests)
+        return product_values(row.product, slug, row.image_urls)
+
+    async def _insert(self, rows: List[ImportRow]) -> List[ImportRow]:
+        """
+        Insert the chunk in one transaction; returns the rows inserted.
+        Slugs taken by concurrent writers since allocation are skipped by
+        ON CONFLICT and those rows retried with fresh slugs.
+        """
+        inserted: List[ImportRow] = []
+        pending = rows
+        async with db.get_async_session() as session:
+            for _ in range(SLUG_INSERT_ATTEMPTS):
+                slugs = await allocate_slugs(session, [base_slug_for(row.product) for row in pending])
+                stmt = (
+                    insert(Product)
+                    .values([self._values(row, slug) for row, slug in zip(pending, slugs)])
+                    .on_conflict_do_nothing(index_elements=[Product.slug])
+                    .returning(Product.id, Product.slug)
+                )
+                created = {slug: product_id for product_id, slug in (await session.execute(stmt)).all()}
+                if created:
+                    # Every product has an analytics row; listings sorted by analytics rely on it
+                    await session.execute(
+                        insert(ProductAnalytics).values([{"product_id": product_id} for product_id in created.values()])
+                    )
+                inserted.extend(row for row, slug in zip(pending, slugs) if slug in created)
+                pending = [row for row, slug in zip(pending, slugs) if slug not in created]
+                if not pending:
+                    break
+            await session.commit()
+
+        for row in pending:
+            self._fail(row.line, "Could not allocate a unique slug")
+        return inserted
+
+    async def _insert_rows(self, rows: List[ImportRow]) -> List[ImportRow]:
+        """
+        Insert the chunk; if the database rejects a value in it, insert its
+        rows one at a time so only the offending rows fail.
+        """
+        try:
+            return await self._insert(rows)
+        except (DataError, IntegrityError) as e:
+            if len(rows) == 1 or (isinstance(e, IntegrityError) and is_slug_conflict(e)):
+                raise
+            logger.warning(f"Product import chunk rejected, retrying its {len(rows)} rows one by one: {_error_message(e)}")
+
+        inserted: List[ImportRow] = []
+        for row in rows:
+            try:
+                inserted.extend(await self._insert([row]))
+            except Exception as e:
+                self._fail(row.line, e)
+        return inserted
+
+    async def _import_chunk(self, rows: List[ImportRow]):
+        started = time.monotonic()
+        if self.fetch_images:
+            rows = await self._fetch_images(rows)
+        if rows:
+            try:
+                inserted = await self._insert_rows(rows)
+            except Exception as e:
+                logger.error(f"Product import chunk failed: {str(e)}")
+                for row in rows:
+                    self._fail(row.line, e)
+                inserted = []
+
+            if inserted:
+                self.report.imported += len(inserted)
+                metrics.inc("product_import.rows_imported", len(inserted))
+                await response_cache.invalidate_catalog()
+                for row in inserted:
+                    showcase.mark_dirty(row.product.category)
+
+        metrics.observe("product_import.chunk_seconds", time.monotonic() - started)
+        elapsed = time.monotonic() - self._started
+        rate = self.report.rows / elapsed if elapsed else 0.0
+        metrics.set_gauge("product_import.rows_per_second", rate)
+        logger.info(
+            f"Product import: {self.report.rows} rows read, {self.report.imported} imported, "
+            f"{self.report.failed} failed ({rate:.0f} rows/s)"
+        )
+
+    async def run(self, stream: BinaryIO, fmt: str) -> ProductImportReport:
+        """
+        Import every row of stream, one chunk at a time. Each chunk is read
+        and validated in a worker thread, so the event loop keeps serving
+        other requests meanwhile.
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{fmt}'")
+
+        self._started = time.monotonic()
+        records = iter_records(stream, fmt)
+        while True:
+            read, chunk, errors = await asyncio.to_thread(read_chunk, records, self.chunk_size)
+            if not read:
+                break
+            self.report.rows += read
+            for line, error in errors:
+                self._fail(line, error)
+            if chunk:
+                await self._import_chunk(chunk)
+
+        self.report.seconds = round(time.monotonic() - self._started, 3)
+        return self.report
+
+
+# ----------------------------------------
+# CLI
+# ----------------------------------------
+async def _run_cli(args) -> ProductImportReport:
+    report_file = open(args.report, "w", encoding="utf-8") if args.report else None
+
+    def write_error(error: ProductImportError):
+        report_file.write(error.model_dump_json() + "\n")
+
+    importer = ProductImporter(
+        chunk_size=args.chunk_size,
+        image_concurrency=args.image_concurrency,
+        fetch_images=not args.link_images,
+        error_sink=write_error if report_file else None,
+    )
+    try:
+        with open(args.path, "rb") as stream:
+            return await importer.run(stream, args.format)
+    finally:
+        if report_file:
+            report_file.close()
+        s3_service.shutdown()
+        await db.close_async()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m services.product_import", description="Bulk import products")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=settings.PRODUCT_IMPORT_CHUNK_SIZE)
+    parser.add_argument("--image-concurrency", type=int, default=settings.PRODUCT_IMPORT_IMAGE_CONCURRENCY)
+    parser.add_argument("--link-images", action="store_true",
+                        help="store image_urls as given instead of fetching them into storage")
+    parser.add_argument("--report", help="write every row error to this JSONL file")
+    args = parser.parse_args(argv)
+
+    args.format = args.format or detect_format(args.path)
+    if args.format is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    report = asyncio.run(_run_cli(args))
+    print(report.model_dump_json(exclude={"errors"}))
+
+
+if __name__ == "__main__":
+    main()
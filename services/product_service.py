@@ -1,29 +1,73 @@
 from slugify import slugify
-from sqlalchemy.orm import Session
+from dataclasses import dataclass, field
+from sqlalchemy import select, or_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.products import Product, ProductAnalytics
 from schemas.products import ProductCreate
 from datetime import datetime
+from typing import Dict, List, Optional, Set
 from sqlalchemy import desc
 
+# A concurrent insert can take an allocated slug before we do; after this
+# many lost races create_product gives up
+SLUG_INSERT_ATTEMPTS = 3
 
-def create_product(db: Session, product_data: ProductCreate, image_links: list):
+
+def base_slug_for(product_data: ProductCreate) -> str:
+    """Slug to build on: the requested slug if given, else the title."""
+    return slugify(product_data.slug or product_data.title) or "product"
+
+
+def _first_free_slug(base: str, taken: Set[str]) -> str:
+    slug = base
+    counter = 1
+    while slug in taken:
+        slug = f"{base}-{counter}"
+        counter += 1
+    return slug
+
+
+async def allocate_slugs(db: AsyncSession, bases: List[str], reserved: Optional[Set[str]] = None) -> List[str]:
     """
-    Create a new product with unique slug and proper handling of list fields.
+    Unique slugs for a batch of base slugs in one query: every existing
+    "base" and "base-N" slug is fetched (an index range scan on
+    ix_products_slug_pattern) and the first free suffix is picked in memory.
+    reserved holds slugs handed out but not yet inserted, e.g. earlier in a
+    bulk import; newly allocated slugs are added to it.
     """
-    base_slug = slugify(product_data.title)
-    slug = base_slug
-    counter = 1
+    taken = reserved if reserved is not None else set()
+    distinct = list(dict.fromkeys(bases))
+    if distinct:
+        # slugify output is [a-z0-9-] only, so bases need no LIKE escaping
+        result = await db.execute(
+            select(Product.slug).where(or_(*(
+                or_(Product.slug == base, Product.slug.like(f"{base}-%")) for base in distinct
+            )))
+        )
+        taken.update(result.scalars())
 
-    while db.query(Product).filter(Product.slug == slug).first():
-        slug = f"{base_slug}-{counter}"
-        counter += 1
+    slugs = []
+    for base in bases:
+        slug = _first_free_slug(base, taken)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def is_slug_conflict(error: IntegrityError) -> bool:
+    return "slug" in str(error.orig)
 
-    db_product = Product(
+
+def product_values(product_data: ProductCreate, slug: str, image_links: list, image_variants: Optional[list] = None) -> dict:
+    """Column values for a new product (see also bulk import)."""
+    return dict(
         title=product_data.title.strip(),
         slug=slug,
         one_liner=product_data.one_liner,
         description=product_data.description,
         image_links=image_links or [],  
+        image_variants=image_variants or [],
         price=product_data.price,
         discounted_price=product_data.discounted_price,
         category=product_data.category,
@@ -34,16 +78,176 @@ def create_product(db: Session, product_data: ProductCreate, image_links: list):
         updated_at=datetime.utcnow(),
     )
 
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+
+async def create_product(db: AsyncSession, product_data: ProductCreate, image_links: list, image_variants: Optional[list] = None):
+    """
+    Create a new product with unique slug and proper handling of list fields.
+    The slug is allocated with one query; if a concurrent insert takes it
+    first, the unique index rejects ours and a fresh slug is allocated.
+    """
+    base_slug = base_slug_for(product_data)
+
+    for attempt in range(1, SLUG_INSERT_ATTEMPTS + 1):
+        [slug] = await allocate_slugs(db, [base_slug])
+        db_product = Product(**product_values(product_data, slug, image_links, image_variants))
+        db_product.analytics = ProductAnalytics()  # every product has one; analytics sorts rely on it
+        try:
+            async with db.begin_nested():
+                db.add(db_product)
+            break
+        except IntegrityError as e:
+            if not is_slug_conflict(e):
+                raise
+            if attempt == SLUG_INSERT_ATTEMPTS:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Could not allocate a unique slug, please retry",
+                )
+
+    await db.commit()
+    await db.refresh(db_product)
     return db_product
 
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, asc
+# Columns a product update may change (image_links is diffed separately)
+UPDATABLE_FIELDS = (
+    "title", "slug", "one_liner", "description", "price", "discounted_price",
+    "category", "subcategory", "dimensions", "is_active",
+)
+REQUIRED_FIELDS = {"title", "slug", "price", "is_active"}
+
+# Every image URL a product references: originals and variant renditions
+IMAGE_REFERENCES_SQL = """
+    SELECT unnest(products.image_links) AS url
+    UNION ALL
+    SELECT variant->>'url'
+    FROM jsonb_array_elements(products.image_variants) AS manifest,
+         jsonb_array_elements(manifest->'variants') AS variant
+"""
+
+
+@dataclass
+class ProductUpdateResult:
+    product: Product
+    changed: List[str] = field(default_factory=list)  # column names
+    previous_category: Optional[str] = None
+    unreferenced_images: List[str] = field(default_factory=list)  # safe to delete from storage
+
+
+async def still_referenced(db: AsyncSession, urls: List[str]) -> Set[str]:
+    """Which of urls some product still uses, as an original or a variant."""
+    if not urls:
+        return set()
+    result = await db.execute(
+        text(
+            f"SELECT DISTINCT refs.url FROM products CROSS JOIN LATERAL ({IMAGE_REFERENCES_SQL}) AS refs "
+            f"WHERE refs.url = ANY(:urls)"
+        ),
+        {"urls": list(urls)},
+    )
+    return set(result.scalars())
+
+
+def _diff_images(product: Product, keep: Optional[List[str]], new_images: List[dict]):
+    """
+    New (image_links, image_variants) for product: the kept images, in the
+    requested order, followed by the new uploads. Returns them with the
+    manifests of the images dropped.
+    """
+    current: Dict[str, dict] = {url: {"original": url, "variants": []} for url in product.image_links or []}
+    for manifest in product.image_variants or []:
+        current[manifest["original"]] = manifest
+
+    if keep is None:
+        keep = list(product.image_links or [])
+    unknown = [url for url in keep if url not in current]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"image_links may only keep or reorder existing images; unknown: {', '.join(unknown)}",
+        )
+
+    kept = list(dict.fromkeys(keep))
+    manifests = [current[url] for url in kept] + list(new_images)
+    dropped = [manifest for url, manifest in current.items() if url not in set(kept)]
+    return [manifest["original"] for manifest in manifests], manifests, dropped
+
+
+async def update_product(
+    db: AsyncSession,
+    product_id: int,
+    changes: dict,
+    new_images: Optional[List[dict]] = None,
+) -> ProductUpdateResult:
+    """
+    Apply changes (field -> value, only the fields being set) to a product.
+    Only columns whose value actually differs are written, so updated_at is
+    bumped only by real changes. "image_links" in changes is the list of
+    existing images to keep, in order; new_images are manifests of images
+    already uploaded, appended after them. Images that are dropped and no
+    longer referenced by any product are returned for deletion, which the
+    caller does after the commit.
+    """
+    product = await db.scalar(select(Product).where(Product.id == product_id).with_for_update())
+    if product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
+
+    nulls = sorted(name for name in REQUIRED_FIELDS if name in changes and changes[name] is None)
+    if nulls:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cannot be null: {', '.join(nulls)}")
+
+    result = ProductUpdateResult(product=product, previous_category=product.category)
+    values = {name: changes[name] for name in UPDATABLE_FIELDS if name in changes}
+    if "title" in values:
+        values["title"] = values["title"].strip()
+    if "slug" in values:
+        base_slug = slugify(values["slug"]) or "product"
+        if base_slug != product.slug:
+            [values["slug"]] = await allocate_slugs(db, [base_slug])
+        else:
+            values["slug"] = product.slug
+
+    dropped: List[dict] = []
+    if "image_links" in changes or new_images:
+        image_links, image_variants, dropped = _diff_images(product, changes.get("image_links"), new_images or [])
+        values["image_links"] = image_links
+        values["image_variants"] = image_variants
+
+    for name, value in values.items():
+        if getattr(product, name) != value:
+            setattr(product, name, value)
+            result.changed.append(name)
+
+    if not result.changed:
+        return result
+
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        if is_slug_conflict(e):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Slug was just taken, please retry")
+        raise
+
+    if dropped:
+        candidates = [manifest["original"] for manifest in dropped]
+        candidates += [variant["url"] for manifest in dropped for variant in manifest.get("variants", [])]
+        candidates = list(dict.fromkeys(candidates))
+        # Variant keys are content hashes, so another product may share them
+        referenced = await still_referenced(db, candidates)
+        result.unreferenced_images = [url for url in candidates if url not in referenced]
+
+    await db.commit()
+    await db.refresh(product)
+    return result
+
+
+from sqlalchemy.orm import joinedload, contains_eager
+from sqlalchemy import desc, asc, func, tuple_
 from typing import Optional, Tuple, List
 from fastapi import HTTPException, status
+from services.search_service import product_search_filter, product_search_rank
+from utils.pagination import CursorPosition, encode_cursor, decode_cursor
 
 SORTABLE_FIELDS = {
     "price": Product.price,
@@ -59,8 +263,46 @@ SORTABLE_FIELDS = {
     "wishlist_count": ProductAnalytics.wishlist_count,
 }
 
-def get_products_paginated(
-    db: Session,
+# Keyset pagination needs a total order without NULLs: sort name -> (key,
+# tiebreak), each pair matching an index (see models.products) so a page is
+# an index range scan. Analytics columns are NOT NULL and every product has
+# an analytics row, so those sorts inner-join product_analytics and break
+# ties on its product_id to walk its (column, product_id) indexes.
+KEYSET_SORT_KEYS = {
+    "id": (Product.id, Product.id),
+    "price": (Product.price, Product.id),
+    "discounted_price": (func.coalesce(Product.discounted_price, Product.price), Product.id),
+    "created_at": (Product.created_at, Product.id),
+    "title": (Product.title, Product.id),
+    "view_count": (ProductAnalytics.view_count, ProductAnalytics.product_id),
+    "purchase_count": (ProductAnalytics.purchase_count, ProductAnalytics.product_id),
+    "rating": (ProductAnalytics.rating, ProductAnalytics.product_id),
+    "review_count": (ProductAnalytics.review_count, ProductAnalytics.product_id),
+    "stock_count": (ProductAnalytics.stock_count, ProductAnalytics.product_id),
+    "wishlist_count": (ProductAnalytics.wishlist_count, ProductAnalytics.product_id),
+}
+
+
+def _apply_product_filters(
+    query,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = True,
+):
+    if is_active is not None:
+        query = query.filter(Product.is_active == is_active)
+    if category:
+        query = query.filter(Product.category.ilike(f"%{category}%"))
+    if subcategory:
+        query = query.filter(Product.subcategory.ilike(f"%{subcategory}%"))
+    if search:
+        query = query.filter(product_search_filter(search))
+    return query
+
+
+async def get_products_paginated(
+    db: AsyncSession,
     page: int = 1,
     limit: int = 10,
     category: Optional[str] = None,
@@ -72,17 +314,10 @@ def get_products_paginated(
 ) -> Tuple[List[Product], int]:
     """
     Fetch paginated products with optional filters, sorting, and analytics included.
+    Search results are ordered by relevance unless an explicit sort is requested.
     """
-    query = db.query(Product).options(joinedload(Product.analytics))
-
-    if is_active is not None:
-        query = query.filter(Product.is_active == is_active)
-    if category:
-        query = query.filter(Product.category.ilike(f"%{category}%"))
-    if subcategory:
-        query = query.filter(Product.subcategory.ilike(f"%{subcategory}%"))
-    if search:
-        query = query.filter(Product.title.ilike(f"%{search}%"))
+    query = select(Product).options(joinedload(Product.analytics))
+    query = _apply_product_filters(query, category, subcategory, search, is_active)
 
     # Apply sorting if valid
     if sort_by in SORTABLE_FIELDS:
@@ -91,25 +326,108 @@ def get_products_paginated(
             query = query.order_by(desc(column))
         else:
             query = query.order_by(asc(column))
+    elif search:
+        query = query.order_by(desc(product_search_rank(search)), desc(Product.id))
 
-    total = query.count()
-    products = query.offset((page - 1) * limit).limit(limit).all()
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    result = await db.execute(query.offset((page - 1) * limit).limit(limit))
+    products = result.unique().scalars().all()
 
     return products, total
 
 
+async def get_products_keyset(
+    db: AsyncSession,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = True,
+    sort_by: Optional[str] = None,
+    sort_order: str = "asc",
+    include_total: bool = False,
+) -> Tuple[List[Product], Optional[str], Optional[str], Optional[int]]:
+    """
+    Fetch one page of products using keyset (cursor) pagination.
+    Each page is a bounded index range scan on (sort key, id), so its cost does
+    not depend on how deep the client has scrolled.
+    Returns (products, next_cursor, prev_cursor, total); total is only counted
+    when include_total is set.
+    """
+    if sort_by not in KEYSET_SORT_KEYS:
+        sort_by = "id"
+    sort_order = sort_order.lower()
+    sort_key, tiebreak = KEYSET_SORT_KEYS[sort_by]
 
-def get_product_by_id(db: Session, product_id: int):
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if position.sort_by != sort_by or position.sort_order != sort_order:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor does not match the requested sort order",
+            )
+
+    query = select(Product, sort_key.label("sort_key"))
+    if tiebreak is ProductAnalytics.product_id:
+        query = query.join(Product.analytics)
+    else:
+        query = query.outerjoin(Product.analytics)
+    query = query.options(contains_eager(Product.analytics))
+    query = _apply_product_filters(query, category, subcategory, search, is_active)
+
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+    backwards = position is not None and position.direction == "prev"
+    scan_desc = (sort_order == "desc") != backwards
+
+    if position is not None:
+        row_key = tuple_(sort_key, tiebreak)
+        if scan_desc:
+            query = query.filter(row_key < tuple_(position.key, position.id))
+        else:
+            query = query.filter(row_key > tuple_(position.key, position.id))
+
+    if scan_desc:
+        query = query.order_by(desc(sort_key), desc(tiebreak))
+    else:
+        query = query.order_by(asc(sort_key), asc(tiebreak))
+
+    rows = list((await db.execute(query.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def _cursor(row, direction: str) -> str:
+        product, key = row
+        return encode_cursor(CursorPosition(sort_by, sort_order, key, product.id, direction))
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = _cursor(rows[-1], "next")
+        if (has_more and backwards) or (position is not None and not backwards):
+            prev_cursor = _cursor(rows[0], "prev")
+
+    return [product for product, _ in rows], next_cursor, prev_cursor, total
+
+
+async def get_product_by_id(db: AsyncSession, product_id: int):
     """
-    Fetch a product by ID, increase its view count, and return it.
-    Handles missing records and database errors gracefully.
+    Fetch an active product by ID.
+    Views are recorded by the route (see view_counter), so this stays a pure read.
     """
     try:
         # Fetch product
-        product = (
-            db.query(Product)
-            .filter(Product.id == product_id, Product.is_active == True)
-            .first()
+        product = await db.scalar(
+            select(Product).where(Product.id == product_id, Product.is_active == True)
         )
 
         if not product:
@@ -118,30 +436,11 @@ def get_product_by_id(db: Session, product_id: int):
                 detail=f"Product with id {product_id} not found",
             )
 
-        # Fetch analytics record for this product
-        analytics = (
-            db.query(ProductAnalytics)
-            .filter(ProductAnalytics.product_id == product_id)
-            .first()
-        )
-
-        # Create analytics row if it doesn't exist
-        if not analytics:
-            analytics = ProductAnalytics(product_id=product_id, view_count=1)
-            db.add(analytics)
-        else:
-            analytics.view_count += 1
-            analytics.updated_at = datetime.utcnow()
-
-        db.commit()
-        db.refresh(product)
-
         return product
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Unexpected error while fetching product: {str(e)}",
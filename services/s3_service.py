@@ -1,18 +1,79 @@
+import asyncio
 import boto3
+import shutil
+import tempfile
 import uuid
 import logging
-from typing import List, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import HTTPException, UploadFile
 import mimetypes
 import os
-from PIL import Image
-import io
+import urllib.error
+import urllib.parse
+import urllib.request
 
 from core.config import settings
+from utils.image_processing import ImageTooLargeError, optimize_image_file, build_renditions
 
 logger = logging.getLogger(__name__)
 
+# S3 accepts at most this many keys per delete_objects request
+MAX_DELETE_BATCH_SIZE = 1000
+
+
+def delete_keys(s3_client, bucket: str, keys: List[str], batch_size: int = MAX_DELETE_BATCH_SIZE) -> Tuple[int, List[str]]:
+    """
+    Delete keys with batched delete_objects calls.
+    Returns (number deleted, keys that could not be deleted).
+    """
+    batch_size = max(1, min(batch_size, MAX_DELETE_BATCH_SIZE))
+    deleted = 0
+    failed: List[str] = []
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as e:
+            logger.error(f"Failed to delete {len(batch)} objects: {str(e)}")
+            failed.extend(batch)
+            continue
+        # Quiet mode only reports failures
+        errors = response.get("Errors", [])
+        for error in errors:
+            logger.error(f"Failed to delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+            failed.append(error.get("Key"))
+        deleted += len(batch) - len(errors)
+    return deleted, failed
+
+
+def check_fetch_url(url: str):
+    """Refuse URLs bulk imports may not fetch: anything but http(s) on IMAGE_FETCH_ALLOWED_HOSTS"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail=f"Unsupported image URL: {url}")
+    allowed = {host.lower() for host in settings.IMAGE_FETCH_ALLOWED_HOSTS}
+    if (parsed.hostname or "") not in allowed:
+        raise HTTPException(status_code=400, detail=f"Image host not allowed: {parsed.hostname}")
+
+
+class _AllowedHostRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Re-check every redirect target, so an allowed host cannot bounce the fetch elsewhere"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_fetch_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_fetch_opener = urllib.request.build_opener(_AllowedHostRedirectHandler)
+
 
 class S3Service:
     def __init__(self):
@@ -29,7 +90,19 @@ class S3Service:
             self.bucket_url = "https://ltqgrulfvenqfcqwuxot.supabase.co/storage/v1/object/public/xsnapster_product_images"
             logger.info("Supabase S3-compatible client initialized successfully")
 
-            
+            # PIL work is CPU bound and boto3 calls block, so neither may run on
+            # the event loop. Pools are created lazily on first upload.
+            self._process_pool: Optional[ProcessPoolExecutor] = None
+            self._io_pool: Optional[ThreadPoolExecutor] = None
+
+            # Uploads stream from disk; files above the threshold go multipart
+            self._transfer_config = TransferConfig(
+                multipart_threshold=settings.S3_MULTIPART_THRESHOLD_BYTES,
+                multipart_chunksize=settings.S3_MULTIPART_CHUNK_BYTES,
+                max_concurrency=settings.S3_MULTIPART_CONCURRENCY,
+                use_threads=settings.S3_MULTIPART_CONCURRENCY > 1,
+            )
+
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {str(e)}")
             raise HTTPException(status_code=500, detail="S3 service initialization failed")
@@ -58,46 +131,74 @@ class S3Service:
         unique_id = str(uuid.uuid4())
         return f"{prefix}/{unique_id}{file_ext}"
 
-    def _optimize_image(self, file_content: bytes, max_size: tuple = (1920, 1080), quality: int = 85) -> bytes:
-        """Optimize image size and quality"""
-        try:
-            # Open image
-            image = Image.open(io.BytesIO(file_content))
-            
-            # Convert RGBA to RGB if necessary (for JPEG)
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            
-            # Resize if larger than max_size
-            if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-                image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            output = io.BytesIO()
-            image_format = 'JPEG' if image.mode == 'RGB' else 'PNG'
-            image.save(output, format=image_format, quality=quality, optimize=True)
-            
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.warning(f"Image optimization failed: {str(e)}, using original")
-            return file_content
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._process_pool
 
-    async def upload_image(self, file: UploadFile, prefix: str = "inventory", optimize: bool = True) -> str:
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_UPLOAD_THREADS,
+                thread_name_prefix="s3-io",
+            )
+        return self._io_pool
+
+    async def _run_io(self, func, *args, **kwargs):
+        """Run a blocking boto3 call on the I/O thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_io_pool(), partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        """Release the worker pools (called on application shutdown)"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False, cancel_futures=True)
+            self._io_pool = None
+
+    def _spool_to_disk(self, source, dest_path: str) -> int:
         """
-        Upload single image to S3 bucket
-        
-        Args:
-            file: FastAPI UploadFile object
-            prefix: S3 key prefix (folder structure)
-            optimize: Whether to optimize image before upload
-            
-        Returns:
-            S3 URL of uploaded image
+        Copy an upload to dest_path in fixed-size chunks, aborting as soon as
+        it exceeds IMAGE_MAX_UPLOAD_BYTES. Runs on the I/O pool.
+        """
+        max_bytes = settings.IMAGE_MAX_UPLOAD_BYTES
+        total = 0
+        with open(dest_path, "wb") as dest:
+            while True:
+                chunk = source.read(settings.IMAGE_UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(status_code=400, detail=self._too_large_detail())
+                dest.write(chunk)
+        return total
+
+    def _download_to_disk(self, url: str, dest_path: str) -> int:
+        """
+        Fetch an image URL to dest_path in fixed-size chunks, with the same
+        size limit as uploads. Runs on the I/O pool.
+        """
+        request = urllib.request.Request(url, headers={"User-Agent": "xsnapster-importer"})
+        with _fetch_opener.open(request, timeout=settings.IMAGE_FETCH_TIMEOUT_SECONDS) as response:
+            content_type = response.headers.get_content_type()
+            if not content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail=f"Not an image ({content_type})")
+            return self._spool_to_disk(response, dest_path)
+
+    def _too_large_detail(self) -> str:
+        return f"File too large. Maximum size is {settings.IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+
+    async def _intake_upload(self, file: UploadFile, work_dir: str) -> str:
+        """
+        Validate an uploaded image and stream it into work_dir.
+        Returns the path of the spooled copy.
         """
         if not file or not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
@@ -109,57 +210,260 @@ class S3Service:
                 detail="Invalid file type. Only JPG, PNG, WEBP, and GIF images are allowed"
             )
         
-        try:
-            # Read file content
-            file_content = await file.read()
-            
-            # Check file size (10MB limit)
-            if len(file_content) > 10 * 1024 * 1024:
-                raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB")
+        # Reject early when the multipart parser already knows the size
+        if file.size is not None and file.size > settings.IMAGE_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=400, detail=self._too_large_detail())
+
+        source_path = os.path.join(work_dir, "source")
+        await self._run_io(self._spool_to_disk, file.file, source_path)
+        return source_path
+
+    async def _upload_file(self, path: str, s3_key: str, content_type: str, original_filename: str,
+                           cache_control: str = 'max-age=31536000') -> str:
+        """
+        Stream a file to S3 under s3_key and return the public URL.
+        Large files are sent as a multipart upload without being read into memory.
+        """
+        await self._run_io(
+            self.s3_client.upload_file,
+            path,
+            self.bucket_name,
+            s3_key,
+            ExtraArgs={
+                'ContentType': content_type,
+                'CacheControl': cache_control,  # 1 year cache by default
+                'Metadata': {
+                    'original_filename': original_filename,
+                    'upload_type': 'inventory_image'
+                },
+            },
+            Config=self._transfer_config,
+        )
+        return f"{self.bucket_url}/{s3_key}"
+
+    def _upload_error(self, e: Exception) -> HTTPException:
+        """Map an upload failure to the HTTPException returned to the client"""
+        if isinstance(e, HTTPException):
+            return e
+        if isinstance(e, ClientError):
+            error_code = e.response['Error']['Code']
+            logger.error(f"S3 upload failed: {error_code} - {str(e)}")
+            return HTTPException(status_code=500, detail=f"Image upload failed: {error_code}")
+        if isinstance(e, ImageTooLargeError):
+            return HTTPException(status_code=400, detail=str(e))
+        if isinstance(e, (urllib.error.URLError, TimeoutError)):
+            return HTTPException(status_code=400, detail=f"Image fetch failed: {getattr(e, 'reason', e)}")
+        if isinstance(e, NoCredentialsError):
+            logger.error("AWS credentials not found")
+            return HTTPException(status_code=500, detail="AWS credentials not configured")
+        logger.error(f"Unexpected error during image upload: {str(e)}")
+        return HTTPException(status_code=500, detail="Image upload failed")
+
+    def _original_content_type(self, filename: str) -> str:
+        content_type, _ = mimetypes.guess_type(filename)
+        return content_type or 'image/jpeg'  # Default fallback
+
+    async def _process(self, func, *args, **kwargs):
+        """Run image processing in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_process_pool(), partial(func, *args, **kwargs))
+
+    async def upload_image(self, file: UploadFile, prefix: str = "inventory", optimize: bool = True) -> str:
+        """
+        Upload single image to S3 bucket
+        
+        Args:
+            file: FastAPI UploadFile object
+            prefix: S3 key prefix (folder structure)
+            optimize: Whether to optimize image before upload
             
+        Returns:
+            S3 URL of uploaded image
+        """
+        work_dir = tempfile.mkdtemp(prefix="upload-")
+        try:
+            source_path = await self._intake_upload(file, work_dir)
+
             # Optimize image if requested
+            optimized = None
             if optimize:
-                file_content = self._optimize_image(file_content)
-            
-            # Generate unique filename
-            s3_key = self._generate_unique_filename(file.filename, prefix)
-            
-            # Determine content type
-            content_type, _ = mimetypes.guess_type(file.filename)
-            if not content_type:
-                content_type = 'image/jpeg'  # Default fallback
-            
-            # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=file_content,
-                ContentType=content_type,
-                CacheControl='max-age=31536000',  # 1 year cache
-                Metadata={
-                    'original_filename': file.filename,
-                    'upload_type': 'inventory_image'
-                }
-            )
-            
-            # Return S3 URL
-            s3_url = f"{self.bucket_url}/{s3_key}"
+                optimized = await self._process(
+                    optimize_image_file, source_path, work_dir, max_pixels=settings.IMAGE_MAX_PIXELS
+                )
+
+            if optimized:
+                s3_key = self._generate_unique_filename(f"image.{optimized['extension']}", prefix)
+                s3_url = await self._upload_file(optimized["path"], s3_key, optimized["content_type"], file.filename)
+            else:
+                s3_key = self._generate_unique_filename(file.filename, prefix)
+                s3_url = await self._upload_file(
+                    source_path, s3_key, self._original_content_type(file.filename), file.filename
+                )
+
             logger.info(f"Successfully uploaded image: {s3_url}")
-            
             return s3_url
             
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            logger.error(f"S3 upload failed: {error_code} - {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Image upload failed: {error_code}")
-        
-        except NoCredentialsError:
-            logger.error("AWS credentials not found")
-            raise HTTPException(status_code=500, detail="AWS credentials not configured")
-        
         except Exception as e:
-            logger.error(f"Unexpected error during image upload: {str(e)}")
-            raise HTTPException(status_code=500, detail="Image upload failed")
+            raise self._upload_error(e)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def upload_product_image(self, file: UploadFile, prefix: str = "inventory") -> dict:
+        """
+        Upload a product image together with its responsive variants.
+        The image is decoded once; every configured size is rendered in every
+        supported format (WebP, plus AVIF when Pillow supports it) and stored
+        under a content-hash key, so identical renditions are never duplicated.
+
+        Memory per upload:
+        - intake: one IMAGE_UPLOAD_CHUNK_BYTES buffer while the upload is
+          streamed to a temp file (oversize files are rejected mid-stream);
+        - processing (worker process): one decoded bitmap plus the smaller
+          renditions made from it. JPEGs are decoded at a reduced DCT scale,
+          so a 24MP photo decodes near 2 x 1920x1080 instead of full size
+          (~6-12MB rather than ~72MB). PNG, WebP and GIF decode at full size
+          whatever the file size, so the bitmap is bounded only by
+          IMAGE_MAX_PIXELS (3-4 bytes per pixel; ~144MB at the default);
+          larger images are rejected with a 400 before decoding;
+        - upload: S3_MULTIPART_CHUNK_BYTES x S3_MULTIPART_CONCURRENCY per file
+          being sent, as renditions are streamed from disk.
+
+        Args:
+            file: FastAPI UploadFile object
+            prefix: S3 key prefix (folder structure)
+
+        Returns:
+            Variant manifest: {"original": url, "variants": [{"name", "format",
+            "width", "height", "bytes", "url"}]}
+        """
+        work_dir = tempfile.mkdtemp(prefix="upload-")
+        try:
+            source_path = await self._intake_upload(file, work_dir)
+            return await self._upload_with_variants(source_path, work_dir, file.filename, prefix)
+        except Exception as e:
+            raise self._upload_error(e)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def import_product_image(self, url: str, prefix: str = "inventory") -> dict:
+        """
+        Fetch a product image from an http(s) URL and upload it with its
+        variants, exactly like upload_product_image. Used by bulk imports.
+
+        Returns:
+            Variant manifest (see upload_product_image)
+        """
+        check_fetch_url(url)
+        parsed = urllib.parse.urlparse(url)
+        filename = os.path.basename(parsed.path) or "image"
+
+        work_dir = tempfile.mkdtemp(prefix="import-")
+        try:
+            source_path = os.path.join(work_dir, "source")
+            await self._run_io(self._download_to_disk, url, source_path)
+            return await self._upload_with_variants(source_path, work_dir, filename, prefix)
+        except Exception as e:
+            raise self._upload_error(e)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _upload_with_variants(self, source_path: str, work_dir: str, filename: str, prefix: str) -> dict:
+        """Render the variants of a spooled image and upload them with the main image"""
+        renditions = await self._process(
+            build_renditions,
+            source_path,
+            work_dir,
+            variant_sizes=settings.IMAGE_VARIANT_SIZES,
+            variant_formats=settings.IMAGE_VARIANT_FORMATS,
+            variant_quality=settings.IMAGE_VARIANT_QUALITY,
+            max_pixels=settings.IMAGE_MAX_PIXELS,
+        )
+
+        main = renditions["main"]
+        if main:
+            main_upload = self._upload_file(
+                main["path"],
+                self._generate_unique_filename(f"image.{main['extension']}", prefix),
+                main["content_type"],
+                filename,
+            )
+        else:
+            main_upload = self._upload_file(
+                source_path,
+                self._generate_unique_filename(filename, prefix),
+                self._original_content_type(filename),
+                filename,
+            )
+
+        variant_uploads = [
+            self._upload_file(
+                variant["path"],
+                f"{prefix}/variants/{variant['sha256']}.{variant['extension']}",
+                variant["content_type"],
+                filename,
+                cache_control='max-age=31536000, immutable',
+            )
+            for variant in renditions["variants"]
+        ]
+
+        original_url, *variant_urls = await asyncio.gather(main_upload, *variant_uploads)
+
+        manifest = {
+            "original": original_url,
+            "variants": [
+                {
+                    "name": variant["name"],
+                    "format": variant["format"],
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "bytes": variant["bytes"],
+                    "url": url,
+                }
+                for variant, url in zip(renditions["variants"], variant_urls)
+            ],
+        }
+        logger.info(f"Successfully uploaded image with {len(variant_urls)} variants: {original_url}")
+
+        return manifest
+
+    async def _upload_concurrently(self, files: List[UploadFile], upload) -> list:
+        """
+        Run `upload(file)` for every file concurrently, at most
+        IMAGE_UPLOAD_CONCURRENCY at a time.
+        Returns one entry per file, in order: the result, or the exception raised.
+        """
+        semaphore = asyncio.Semaphore(settings.IMAGE_UPLOAD_CONCURRENCY)
+
+        async def _upload(file: UploadFile):
+            async with semaphore:
+                # Reset file pointer
+                await file.seek(0)
+                return await upload(file)
+
+        return await asyncio.gather(*(_upload(file) for file in files), return_exceptions=True)
+
+    async def upload_images(self, files: List[UploadFile], prefix: str = "inventory") -> List[dict]:
+        """
+        Upload product images and their variants concurrently; fail if any
+        single upload fails.
+
+        Args:
+            files: List of FastAPI UploadFile objects
+            prefix: S3 key prefix (folder structure)
+
+        Returns:
+            List of variant manifests (see upload_product_image), in the same order as files
+        """
+        if not files:
+            return []
+
+        results = await self._upload_concurrently(files, partial(self.upload_product_image, prefix=prefix))
+        for file, result in zip(files, results):
+            if isinstance(result, BaseException):
+                detail = result.detail if isinstance(result, HTTPException) else str(result)
+                raise HTTPException(status_code=500, detail=f"Failed to upload {file.filename}: {detail}")
+
+        return list(results)
 
     async def upload_multiple_images(self, files: List[UploadFile], prefix: str = "inventory") -> List[str]:
         """
@@ -181,18 +485,16 @@ class S3Service:
         
         uploaded_urls = []
         failed_uploads = []
-        
-        for i, file in enumerate(files):
-            try:
-                # Reset file pointer
-                await file.seek(0)
-                url = await self.upload_image(file, prefix)
 
-                uploaded_urls.append(url)
-                
-            except HTTPException as e:
-                failed_uploads.append(f"{file.filename}: {e.detail}")
-                logger.error(f"Failed to upload {file.filename}: {e.detail}")
+        results = await self._upload_concurrently(files, partial(self.upload_image, prefix=prefix))
+        for file, result in zip(files, results):
+            if isinstance(result, HTTPException):
+                failed_uploads.append(f"{file.filename}: {result.detail}")
+                logger.error(f"Failed to upload {file.filename}: {result.detail}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                uploaded_urls.append(result)
         
         # If some uploads failed, log but don't fail the entire request
         if failed_uploads:
@@ -230,9 +532,18 @@ class S3Service:
             logger.error(f"Failed to delete image {s3_url}: {str(e)}")
             return False
 
+    def key_for_url(self, s3_url: str) -> Optional[str]:
+        """S3 key of a URL in our bucket, or None for anything else (e.g. external links)"""
+        prefix = f"{self.bucket_url}/"
+        if not s3_url.startswith(prefix):
+            return None
+        return s3_url[len(prefix):]
+
     def delete_multiple_images(self, s3_urls: List[str]) -> int:
         """
-        Delete multiple images from S3 bucket
+        Delete multiple images from S3 bucket with batched delete_objects
+        calls (up to S3_DELETE_BATCH_SIZE keys each). URLs outside the
+        bucket are ignored.
         
         Args:
             s3_urls: List of S3 URLs
@@ -240,16 +551,18 @@ class S3Service:
         Returns:
             Number of successfully deleted images
         """
-        if not s3_urls:
+        keys = list(dict.fromkeys(key for key in map(self.key_for_url, s3_urls or []) if key))
+        if not keys:
             return 0
-        
-        deleted_count = 0
-        for url in s3_urls:
-            if self.delete_image(url):
-                deleted_count += 1
-        
+
+        deleted_count, _ = delete_keys(self.s3_client, self.bucket_name, keys, settings.S3_DELETE_BATCH_SIZE)
+        logger.info(f"Deleted {deleted_count} of {len(keys)} images")
         return deleted_count
 
+    async def delete_images(self, s3_urls: List[str]) -> int:
+        """delete_multiple_images on the I/O pool, for use from request handlers"""
+        return await self._run_io(self.delete_multiple_images, s3_urls)
+
     def get_presigned_url(self, s3_url: str, expiration: int = 3600) -> str:
         """
         Generate presigned URL for private images (if needed)
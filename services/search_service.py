@@ -0,0 +1,22 @@
+from sqlalchemy import func, or_
+
+from models.products import Product, SEARCH_TEXT_CONFIG
+
+
+def product_search_filter(term: str):
+    """
+    Match products whose search_vector (title, one_liner, category, description)
+    satisfies the query, or whose title contains a word similar to the term
+    (pg_trgm, for typo tolerance). Both branches are served by GIN indexes.
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, term)
+    return or_(
+        Product.search_vector.op("@@")(ts_query),
+        Product.title.op("%>")(term),
+    )
+
+
+def product_search_rank(term: str):
+    """Relevance score for ordering search results, highest first."""
+    ts_query = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, term)
+    return func.ts_rank_cd(Product.search_vector, ts_query) + func.word_similarity(term, Product.title)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, func, desc
+
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+from models.products import Product, ProductAnalytics
+from schemas.products import ProductResponse, ShowcaseCategory, ShowcaseResponse
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryShowcase:
+    """
+    In-memory index of the top N active products per category, ranked by
+    purchase_count, then view_count, then rating.
+
+    The index is rebuilt in full on a slow schedule (analytics drift
+    continuously) and incrementally, per category, on a fast schedule for
+    categories marked dirty by catalog writes. Serving the homepage is a
+    dictionary read and never touches the database.
+    """
+
+    def __init__(self, per_category: int, refresh_interval: float, full_refresh_interval: float):
+        self.per_category = per_category
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self._index: Dict[str, List[ProductResponse]] = {}
+        self._refreshed_at: Optional[datetime] = None
+        self._last_full_refresh = 0.0
+        self._dirty: Set[str] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._serialized: Dict[int, bytes] = {}
+
+    def mark_dirty(self, category: Optional[str]):
+        """Schedule `category` for re-ranking on the next incremental refresh."""
+        if category:
+            self._dirty.add(category)
+
+    async def _load(self, categories: Optional[Iterable[str]] = None) -> Dict[str, List[ProductResponse]]:
+        rank = func.row_number().over(
+            partition_by=Product.category,
+            order_by=(
+                desc(func.coalesce(ProductAnalytics.purchase_count, 0)),
+                desc(func.coalesce(ProductAnalytics.view_count, 0)),
+                desc(func.coalesce(ProductAnalytics.rating, 0.0)),
+                desc(Product.id),
+            ),
+        ).label("rank")
+
+        ranked = (
+            select(Product.id, rank)
+            .outerjoin(Product.analytics)
+            .where(Product.is_active == True, Product.category.isnot(None))
+        )
+        if categories is not None:
+            ranked = ranked.where(Product.category.in_(list(categories)))
+        ranked = ranked.subquery()
+
+        stmt = (
+            select(Product)
+            .join(ranked, ranked.c.id == Product.id)
+            .where(ranked.c.rank <= self.per_category)
+            .order_by(Product.category, ranked.c.rank)
+        )
+
+        index: Dict[str, List[ProductResponse]] = {category: [] for category in categories or []}
+        async with db.get_async_session() as session:
+            for product in (await session.execute(stmt)).scalars():
+                index.setdefault(product.category, []).append(ProductResponse.model_validate(product))
+        return index
+
+    async def refresh(self, full: bool = False, if_empty: bool = False):
+        """
+        Rebuild the whole index, or only the categories marked dirty. With
+        if_empty, do nothing once the index has been built: requests arriving
+        during a cold start wait for the first build instead of each queueing
+        another full scan behind the lock.
+        """
+        async with self._lock:
+            if if_empty and self._refreshed_at is not None:
+                return
+            if not full and not self._dirty:
+                return
+
+            started = time.monotonic()
+            if full:
+                self._dirty.clear()
+                self._index = await self._load()
+                self._last_full_refresh = started
+            else:
+                categories, self._dirty = self._dirty, set()
+                try:
+                    updated = await self._load(categories)
+                except Exception:
+                    self._dirty |= categories
+                    raise
+                index = dict(self._index)
+                for category, products in updated.items():
+                    if products:
+                        index[category] = products
+                    else:
+                        index.pop(category, None)
+                self._index = index
+
+            self._refreshed_at = datetime.now(timezone.utc)
+            self._serialized = {}
+            metrics.observe(
+                "showcase.full_refresh_seconds" if full else "showcase.incremental_refresh_seconds",
+                time.monotonic() - started,
+            )
+            metrics.set_gauge("showcase.categories", len(self._index))
+
+    async def get_response(self, per_category: Optional[int] = None) -> bytes:
+        """Serialized showcase with at most per_category products per category."""
+        if self._refreshed_at is None:
+            await self.refresh(full=True, if_empty=True)
+
+        limit = min(per_category or self.per_category, self.per_category)
+        cached = self._serialized.get(limit)
+        if cached is None:
+            cached = ShowcaseResponse(
+                refreshed_at=self._refreshed_at,
+                categories=[
+                    ShowcaseCategory(category=category, products=products[:limit])
+                    for category, products in sorted(self._index.items())
+                ],
+            ).model_dump_json().encode()
+            self._serialized[limit] = cached
+        return cached
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            full = time.monotonic() - self._last_full_refresh >= self.full_refresh_interval
+            try:
+                await self.refresh(full=full)
+            except Exception as e:
+                metrics.inc("showcase.refresh_errors")
+                logger.error(f"Showcase refresh failed: {str(e)}")
+
+    def start(self):
+        """Start the periodic refresher on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+showcase = CategoryShowcase(
+    per_category=settings.SHOWCASE_PRODUCTS_PER_CATEGORY,
+    refresh_interval=settings.SHOWCASE_REFRESH_SECONDS,
+    full_refresh_interval=settings.SHOWCASE_FULL_REFRESH_SECONDS,
+)
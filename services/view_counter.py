@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import text
+
+from core.config import settings
+from core.metrics import metrics
+from db.session import db
+
+logger = logging.getLogger(__name__)
+
+
+# Applies every buffered delta in a single upsert: existing analytics rows are
+# bumped in place, missing ones are inserted. ON CONFLICT on the unique
+# product_id makes concurrent flushes from several workers safe, and rows are
+# written in product_id order so two flushes cannot deadlock. Products that no
+# longer exist are skipped.
+FLUSH_VIEW_COUNTS_SQL = text(
+    """
+    INSERT INTO product_analytics (
+        product_id, view_count, purchase_count, rating,
+        review_count, stock_count, wishlist_count
+    )
+    SELECT d.product_id, d.delta, 0, 0.0, 0, 0, 0
+    FROM unnest(CAST(:product_ids AS INTEGER[]), CAST(:deltas AS INTEGER[]))
+         AS d(product_id, delta)
+    JOIN products p ON p.id = d.product_id
+    ORDER BY d.product_id
+    ON CONFLICT (product_id) DO UPDATE
+    SET view_count = product_analytics.view_count + EXCLUDED.view_count,
+        updated_at = now()
+    """
+)
+
+
+class ViewCountBuffer:
+    """
+    Aggregates product view increments in memory and writes them to
+    product_analytics in one bulk statement per flush, so a product page
+    view never opens a write transaction.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Counter = Counter()
+        self._oldest_pending_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def record(self, product_id: int):
+        """Count one view of `product_id`. Never touches the database."""
+        with self._lock:
+            if not self._pending:
+                self._oldest_pending_at = time.monotonic()
+            self._pending[product_id] += 1
+            pending_products = len(self._pending)
+
+        if pending_products >= self.max_pending and self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            oldest, self._oldest_pending_at = self._oldest_pending_at, None
+        return pending, oldest
+
+    def _restore(self, pending: Counter, oldest: Optional[float]):
+        with self._lock:
+            self._pending.update(pending)
+            if oldest is not None and (
+                self._oldest_pending_at is None or oldest < self._oldest_pending_at
+            ):
+                self._oldest_pending_at = oldest
+
+    def flush(self) -> int:
+        """
+        Write all buffered increments to the database.
+        Returns the number of products flushed. On failure the increments
+        are put back into the buffer and retried on the next flush.
+        """
+        with self._flush_lock:
+            pending, oldest = self._drain()
+            if not pending:
+                metrics.set_gauge("view_counts.flush_lag_seconds", 0)
+                return 0
+
+            started = time.monotonic()
+            session = db.get_session()
+            try:
+                product_ids = list(pending.keys())
+                session.execute(
+                    FLUSH_VIEW_COUNTS_SQL,
+                    {
+                        "product_ids": product_ids,
+                        "deltas": [pending[pid] for pid in product_ids],
+                    },
+                )
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                self._restore(pending, oldest)
+                metrics.inc("view_counts.flush_errors")
+                logger.error(f"View count flush failed, will retry: {str(e)}")
+                return 0
+            finally:
+                session.close()
+
+            finished = time.monotonic()
+            metrics.observe("view_counts.flush_duration_seconds", finished - started)
+            metrics.set_gauge("view_counts.flush_lag_seconds", finished - oldest)
+            metrics.inc("view_counts.flushed_views", sum(pending.values()))
+            metrics.inc("view_counts.flushed_products", len(pending))
+            return len(pending)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        """Start the periodic flusher on the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flusher and flush whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+view_counter = ViewCountBuffer(
+    flush_interval=settings.VIEW_COUNT_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.VIEW_COUNT_MAX_PENDING_PRODUCTS,
+)
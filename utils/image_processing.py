@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+
+# These functions run inside a process pool (see S3Service), so they must stay
+# importable without application settings and only deal in picklable values.
+# Images are passed as file paths, never as bytes, so large payloads are not
+# copied between processes.
+
+VARIANT_FORMATS = {
+    # name: (Pillow format, content type, extension)
+    "webp": ("WEBP", "image/webp", "webp"),
+    "avif": ("AVIF", "image/avif", "avif"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+
+MAIN_FORMATS = {
+    "RGB": ("JPEG", "image/jpeg", "jpg"),
+    "default": ("PNG", "image/png", "png"),
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """The image would decode to more pixels than allowed; it is rejected, not uploaded as is"""
+
+
+def supported_variant_formats(formats: Sequence[str]) -> List[str]:
+    """Drop formats this Pillow build cannot encode (AVIF needs libavif)"""
+    supported = []
+    for fmt in formats:
+        fmt = fmt.lower()
+        if fmt not in VARIANT_FORMATS:
+            logger.warning(f"Unknown image variant format ignored: {fmt}")
+            continue
+        if fmt in ("webp", "avif") and not features.check(fmt):
+            continue
+        supported.append(fmt)
+    return supported
+
+
+def _open_reduced(src_path: str, target_size: Tuple[int, int], max_pixels: Optional[int] = None) -> Image.Image:
+    """
+    Open and decode an image, letting JPEG decode directly at a reduced
+    scale (1/2, 1/4 or 1/8) that is still at least target_size. This keeps
+    the decoded bitmap close to the largest size actually needed. Other
+    formats decode at full size, so images that would still decode to more
+    than max_pixels are refused before anything is decoded.
+    """
+    image = Image.open(src_path)
+    if image.format == "JPEG":
+        image.draft("RGB", target_size)
+    if max_pixels and image.width * image.height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {image.width}x{image.height} pixels; at most {max_pixels // 1_000_000} megapixels are accepted"
+        )
+    image.load()
+    return image
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """
+    Convert to RGB (or keep L) so every encoder can write it: transparency
+    is flattened onto white, other modes (CMYK, I;16, ...) are converted.
+    """
+    if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def _fit(image: Image.Image, max_size: Tuple[int, int]) -> Image.Image:
+    """Return a copy no larger than max_size, keeping aspect ratio"""
+    image = image.copy()
+    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return image
+
+
+def _save(image: Image.Image, path: str, image_format: str, quality: int) -> dict:
+    image.save(path, format=image_format, quality=quality, optimize=True)
+    return {"path": path, "bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _main_format(image: Image.Image) -> Tuple[str, str, str]:
+    return MAIN_FORMATS["RGB"] if image.mode == "RGB" else MAIN_FORMATS["default"]
+
+
+def optimize_image_file(src_path: str, out_dir: str, max_size: tuple = (1920, 1080), quality: int = 85,
+                        max_pixels: Optional[int] = None) -> dict:
+    """
+    Optimize image size and quality.
+    Returns {"path", "content_type", "extension", "bytes", "sha256"} of the
+    optimized file, or None if the image could not be processed.
+    Raises ImageTooLargeError above max_pixels.
+    """
+    try:
+        image = _fit(_flatten(_open_reduced(src_path, max_size, max_pixels)), max_size)
+
+        # Save optimized image
+        image_format, content_type, extension = _main_format(image)
+        saved = _save(image, os.path.join(out_dir, f"main.{extension}"), image_format, quality)
+        return {**saved, "content_type": content_type, "extension": extension}
+
+    except ImageTooLargeError:
+        raise
+    except Exception as e:
+        logger.warning(f"Image optimization failed: {str(e)}, using original")
+        return None
+
+
+def build_renditions(
+    src_path: str,
+    out_dir: str,
+    max_size: tuple = (1920, 1080),
+    quality: int = 85,
+    variant_sizes: Dict[str, Tuple[int, int]] = None,
+    variant_formats: Sequence[str] = (),
+    variant_quality: int = 80,
+    max_pixels: Optional[int] = None,
+) -> dict:
+    """
+    Decode the image once and write both the optimized main image and every
+    responsive variant (each size in each supported format) into out_dir.
+
+    Returns {"main": {...} or None, "variants": [{"name", "format",
+    "content_type", "extension", "width", "height", "path", "bytes",
+    "sha256"}]}. If processing fails main is None (the caller uploads the
+    original) and no variants are produced. Images above max_pixels raise
+    ImageTooLargeError instead.
+    """
+    variant_sizes = variant_sizes or {}
+    largest = (
+        max([max_size[0]] + [size[0] for size in variant_sizes.values()]),
+        max([max_size[1]] + [size[1] for size in variant_sizes.values()]),
+    )
+
+    try:
+        return _render(src_path, out_dir, largest, max_size, quality, variant_sizes, variant_formats, variant_quality, max_pixels)
+    except ImageTooLargeError:
+        raise
+    except Exception as e:
+        logger.warning(f"Image processing failed: {str(e)}, using original")
+        return {"main": None, "variants": []}
+
+
+def _render(
+    src_path: str,
+    out_dir: str,
+    largest: Tuple[int, int],
+    max_size: tuple,
+    quality: int,
+    variant_sizes: Dict[str, Tuple[int, int]],
+    variant_formats: Sequence[str],
+    variant_quality: int,
+    max_pixels: Optional[int],
+) -> dict:
+    image = _flatten(_open_reduced(src_path, largest, max_pixels))
+
+    main = _fit(image, max_size)
+    image_format, content_type, extension = _main_format(main)
+    main_file = _save(main, os.path.join(out_dir, f"main.{extension}"), image_format, quality)
+    main_info = {**main_file, "content_type": content_type, "extension": extension}
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    formats = supported_variant_formats(variant_formats)
+    variants = []
+    source = image
+    # Largest first, so each size is downscaled from the previous one
+    for name, size in sorted(variant_sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+        resized = _fit(source, tuple(size))
+        source = resized
+        for fmt in formats:
+            pil_format, content_type, extension = VARIANT_FORMATS[fmt]
+            saved = _save(resized, os.path.join(out_dir, f"{name}.{extension}"), pil_format, variant_quality)
+            variants.append({
+                "name": name,
+                "format": fmt,
+                "content_type": content_type,
+                "extension": extension,
+                "width": resized.width,
+                "height": resized.height,
+                **saved,
+            })
+
+    return {"main": main_info, "variants": variants}
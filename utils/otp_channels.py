@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from core.config import settings
+from utils.otp_sender import SMTPConnectionPool, build_otp_email, smtp_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OTPMessage:
+    destination: str  # email address or E.164 phone number
+    otp_code: str
+
+
+class RateLimiter:
+    """
+    Async token bucket: `rate` sends per second on average, with bursts of
+    up to `burst`. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        tokens = min(tokens, self.burst)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class OTPChannel:
+    """
+    A provider that delivers OTP codes to one kind of destination.
+
+    send() splits messages into batches of at most batch_size, runs up to
+    `concurrency` batches at once and keeps the provider under
+    `rate_per_second` messages. Subclasses implement _send_batch, returning
+    one entry per message: None if it was sent, otherwise the exception.
+    """
+
+    name = "channel"
+
+    def __init__(self, concurrency: int, rate_per_second: float, batch_size: int = 1):
+        self.batch_size = max(batch_size, 1)
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._limiter = RateLimiter(rate_per_second, burst=max(rate_per_second, self.batch_size))
+
+    async def send(self, messages: List[OTPMessage]) -> List[Optional[Exception]]:
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        results = await asyncio.gather(*(self._send_limited(batch) for batch in batches))
+        return [error for batch_result in results for error in batch_result]
+
+    async def _send_limited(self, batch: List[OTPMessage]) -> List[Optional[Exception]]:
+        async with self._slots:
+            await self._limiter.acquire(len(batch))
+            try:
+                return await self._send_batch(batch)
+            except Exception as e:
+                logger.error(f"{self.name} channel failed to send a batch of {len(batch)}: {str(e)}")
+                return [e] * len(batch)
+
+    async def _send_batch(self, batch: List[OTPMessage]) -> List[Optional[Exception]]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SMTPEmailChannel(OTPChannel):
+    """Email over the pooled SMTP connections; a batch shares one connection."""
+
+    name = "smtp"
+
+    def __init__(self, pool: SMTPConnectionPool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    async def _send_batch(self, batch: List[OTPMessage]) -> List[Optional[Exception]]:
+        emails = [build_otp_email(message.destination, message.otp_code) for message in batch]
+        return await asyncio.to_thread(self.pool.send_many, emails)
+
+    async def close(self):
+        await asyncio.to_thread(self.pool.close)
+
+
+class SNSSMSChannel(OTPChannel):
+    """
+    SMS through Amazon SNS direct publish. SNS has no batch API for SMS, so
+    every message is its own request; concurrency bounds the requests in
+    flight and the rate limit should match the account's SMS TPS quota.
+    Credentials come from boto3's default chain (environment, profile or
+    instance role), not the storage keys in settings.
+    """
+
+    name = "sns"
+
+    def __init__(self, region: str, sender_id: Optional[str] = None, **kwargs):
+        kwargs["batch_size"] = 1
+        super().__init__(**kwargs)
+        self.region = region
+        self.sender_id = sender_id
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("sns", region_name=self.region)
+        return self._client
+
+    def _publish(self, message: OTPMessage):
+        attributes = {
+            "AWS.SNS.SMS.SMSType": {"DataType": "String", "StringValue": "Transactional"},
+        }
+        if self.sender_id:
+            attributes["AWS.SNS.SMS.SenderID"] = {"DataType": "String", "StringValue": self.sender_id}
+        self.client.publish(
+            PhoneNumber=message.destination,
+            Message=f"Your XSnapster OTP is: {message.otp_code}. It will expire in 5 minutes.",
+            MessageAttributes=attributes,
+        )
+
+    async def _send_batch(self, batch: List[OTPMessage]) -> List[Optional[Exception]]:
+        await asyncio.to_thread(self._publish, batch[0])
+        return [None]
+
+
+class FakeOTPChannel(OTPChannel):
+    """
+    Local provider for development and tests: records messages in memory
+    instead of sending them. Destinations in fail_destinations fail with a
+    RuntimeError; `latency` simulates a slow provider.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, fail_destinations: Optional[Set[str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.fail_destinations = fail_destinations or set()
+        self.sent: List[OTPMessage] = []
+        self.batches: List[int] = []
+
+    async def _send_batch(self, batch: List[OTPMessage]) -> List[Optional[Exception]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.batches.append(len(batch))
+        results: List[Optional[Exception]] = []
+        for message in batch:
+            if message.destination in self.fail_destinations:
+                results.append(RuntimeError(f"Fake delivery to {message.destination} failed"))
+            else:
+                logger.info(f"[fake OTP] {message.destination}: {message.otp_code}")
+                self.sent.append(message)
+                results.append(None)
+        return results
+
+
+def build_otp_channels() -> Dict[str, OTPChannel]:
+    """Channels keyed by OTP.for_field ('email' / 'phone'), per the configured providers."""
+    channels: Dict[str, OTPChannel] = {}
+
+    email_limits = dict(
+        concurrency=settings.OTP_EMAIL_CONCURRENCY,
+        rate_per_second=settings.OTP_EMAIL_RATE_PER_SECOND,
+        batch_size=settings.OTP_EMAIL_BATCH_SIZE,
+    )
+    email_provider = settings.OTP_EMAIL_PROVIDER.lower()
+    if email_provider == "smtp":
+        channels["email"] = SMTPEmailChannel(smtp_pool, **email_limits)
+    elif email_provider == "fake":
+        channels["email"] = FakeOTPChannel(**email_limits)
+    else:
+        raise RuntimeError(f"Unknown OTP_EMAIL_PROVIDER '{settings.OTP_EMAIL_PROVIDER}'")
+
+    sms_limits = dict(
+        concurrency=settings.OTP_SMS_CONCURRENCY,
+        rate_per_second=settings.OTP_SMS_RATE_PER_SECOND,
+    )
+    sms_provider = settings.OTP_SMS_PROVIDER.lower()
+    if sms_provider == "sns":
+        channels["phone"] = SNSSMSChannel(
+            region=settings.OTP_SMS_SNS_REGION or settings.AWS_REGION,
+            sender_id=settings.OTP_SMS_SENDER_ID,
+            **sms_limits,
+        )
+    elif sms_provider == "fake":
+        channels["phone"] = FakeOTPChannel(**sms_limits)
+    else:
+        raise RuntimeError(f"Unknown OTP_SMS_PROVIDER '{settings.OTP_SMS_PROVIDER}'")
+
+    return channels
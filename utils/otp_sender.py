@@ -1,15 +1,20 @@
+import logging
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
-from random import randint
-from core.config import settings  
+from typing import List, Optional, Tuple
 
+from core.config import settings
 
+logger = logging.getLogger(__name__)
 
-def send_otp_email(to_email: str, otp: str):
+
+def build_otp_email(to_email: str, otp: str) -> MIMEText:
     """
-    Send OTP via SMTP using contact@xsnapster.store
+    Build the OTP email sent from contact@xsnapster.store
     """
-    print("Sending OTP email to", to_email)
     subject = "Your XSnapster OTP Code"
     body = f"Your OTP is: {otp}. It will expire in 5 minutes."
 
@@ -17,17 +22,120 @@ def send_otp_email(to_email: str, otp: str):
     msg['Subject'] = subject
     msg['From'] = settings.EMAIL_USER  # contact@xsnapster.store
     msg['To'] = to_email
+    return msg
+
+
+# The server refused one message; the connection stays usable. These are
+# OSError subclasses, so they must be caught before the reconnect handler.
+MESSAGE_REJECTED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of logged-in SMTP_SSL connections.
+
+    Connections are reused across sends so the TLS handshake and login are
+    paid once per connection rather than once per email. Connections idle
+    for longer than max_idle are replaced (servers drop them), and a send
+    on a connection that turns out to be dead is retried once on a fresh one.
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 size: int = 4, max_idle: float = 60.0, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP_SSL, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        logger.info(f"Opening SMTP connection to {self.host}:{self.port}")
+        connection = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.login(self.username, self.password)
+        except Exception:
+            self._close(connection)
+            raise
+        return connection
+
+    @staticmethod
+    def _close(connection: smtplib.SMTP_SSL):
+        try:
+            connection.quit()
+        except Exception:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> smtplib.SMTP_SSL:
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used <= self.max_idle:
+                return connection
+            self._close(connection)
+
+    def _checkin(self, connection: smtplib.SMTP_SSL):
+        self._idle.put((connection, time.monotonic()))
+
+    def send_many(self, messages: List[MIMEText]) -> List[Optional[Exception]]:
+        """
+        Send several messages on one pooled connection, so a batch pays for a
+        single checkout and thread hop. Returns one entry per message: None
+        on success, otherwise the exception that message failed with.
+        Blocking; run it off the event loop.
+        """
+        results: List[Optional[Exception]] = []
+        with self._slots:
+            connection = None
+            for msg in messages:
+                try:
+                    if connection is None:
+                        connection = self._checkout()
+                    try:
+                        connection.send_message(msg)
+                    except MESSAGE_REJECTED:
+                        raise
+                    except (smtplib.SMTPServerDisconnected, OSError):
+                        # Stale connection: reconnect once and retry
+                        self._close(connection)
+                        connection = None
+                        connection = self._connect()
+                        connection.send_message(msg)
+                    results.append(None)
+                except MESSAGE_REJECTED as e:
+                    # The server rejected this message; the connection itself is fine
+                    results.append(e)
+                except Exception as e:
+                    if connection is not None:
+                        self._close(connection)
+                        connection = None
+                    results.append(e)
+            if connection is not None:
+                self._checkin(connection)
+        return results
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
 
-    try:
-        print("Connecting to SMTP server")
-        with smtplib.SMTP_SSL(settings.SMTP_SERVER, 465) as server:
-            # server.starttls()
-            print("Logging in to SMTP server")
-            server.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
-            print("Sending email")
-            response = server.send_message(msg)
-            print("SMTP response:", response)
-            print("OTP email sent successfully")
-    except Exception as e:
-        print("Error sending email:", e)
-        raise
+smtp_pool = SMTPConnectionPool(
+    host=settings.SMTP_SERVER,
+    port=465,  # implicit TLS (SMTP_SSL), as the sender has always used
+    username=settings.EMAIL_USER,
+    password=settings.EMAIL_PASSWORD,
+    size=settings.SMTP_POOL_SIZE,
+    max_idle=settings.SMTP_CONNECTION_MAX_IDLE_SECONDS,
+    timeout=settings.SMTP_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, NamedTuple
+
+
+class CursorPosition(NamedTuple):
+    sort_by: str
+    sort_order: str
+    key: Any
+    id: int
+    direction: str  # 'next' or 'prev'
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(position: CursorPosition) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor string."""
+    payload = {
+        "s": position.sort_by,
+        "o": position.sort_order,
+        "k": _encode_value(position.key),
+        "i": position.id,
+        "d": position.direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> CursorPosition:
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        position = CursorPosition(
+            sort_by=payload["s"],
+            sort_order=payload["o"],
+            key=_decode_value(payload["k"]),
+            id=int(payload["i"]),
+            direction=payload["d"],
+        )
+    except Exception:
+        raise ValueError("Malformed cursor")
+
+    if position.direction not in ("next", "prev"):
+        raise ValueError("Malformed cursor")
+    return position